@@ -0,0 +1,247 @@
+#! /usr/bin/env python
+
+"""
+Measure the throughput of the Fast Downward parsers in downward/scripts.
+
+The script writes synthetic logs of the given size into temporary run
+directories and times each parser on them. Each parser runs in this
+process like in a parser host (see lab.parser.run_parsers()), with the
+properties that the preceding parsers produce. Example:
+
+    dev/benchmark-parsers.py --size 50 --repetitions 5
+
+"""
+
+import argparse
+import contextlib
+import io
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+from lab import parser, tools  # noqa: E402
+
+
+SCRIPTS_DIR = REPO / "downward" / "scripts"
+
+# Parsers in the order in which Fast Downward experiments add them.
+SINGLE_SEARCH_PARSERS = [
+    "exitcode-parser.py",
+    "translator-parser.py",
+    "single-search-parser.py",
+    "planner-parser.py",
+]
+ANYTIME_SEARCH_PARSERS = [
+    "exitcode-parser.py",
+    "translator-parser.py",
+    "anytime-search-parser.py",
+    "planner-parser.py",
+]
+
+DRIVER_LOG = """\
+node: localhost
+planner time: 12.34s
+planner wall-clock time: 12.5s
+planner exit code: 0
+"""
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    argparser.add_argument(
+        "--size",
+        type=float,
+        default=10,
+        help="size of each log in MiB (default: %(default)s)",
+    )
+    argparser.add_argument(
+        "--repetitions",
+        type=int,
+        default=3,
+        help="number of runs per parser, report the fastest (default: %(default)s)",
+    )
+    argparser.add_argument(
+        "--iterations",
+        type=int,
+        default=100,
+        help="number of plans found by the anytime search (default: %(default)s)",
+    )
+    argparser.add_argument(
+        "--heuristics",
+        type=int,
+        default=50,
+        help="number of initial heuristic values (default: %(default)s)",
+    )
+    argparser.add_argument(
+        "--parsers",
+        nargs="+",
+        metavar="PARSER",
+        help="only time these parsers, e.g., translator-parser.py",
+    )
+    return argparser.parse_args()
+
+
+def write_translator_log(f, num_lines):
+    f.write("INFO     Running translator.\n")
+    for index in range(num_lines):
+        if index % 3 == 0:
+            f.write(f"Computing step {index}: [0.001s CPU, 0.001s wall-clock]\n")
+        elif index % 3 == 1:
+            f.write(f"{index} relevant atoms\n")
+        else:
+            f.write(f"Instantiating action {index}...\n")
+    for name in ["variables", "facts", "operators", "axioms", "task size"]:
+        f.write(f"Translator {name}: 1234\n")
+    f.write("Translator peak memory: 28000 KB\n")
+    f.write("Done! [6.860s CPU, 6.923s wall-clock]\n")
+    f.write("translate exit code: 0\n")
+
+
+def write_search_header(f, num_heuristics):
+    f.write("INFO     Running search (release).\n")
+    f.write("planner time limit: 1800s\nplanner memory limit: 3584 MB\n")
+    f.write("search time limit: 1786s\nsearch memory limit: 3556 MB\n")
+    for index in range(num_heuristics):
+        f.write(f"Initial heuristic value for h{index}: {index}\n")
+
+
+def write_progress(f, num_lines, offset=0):
+    for index in range(offset, offset + num_lines):
+        f.write(
+            f"[g={index % 100}, {3 * index} evaluated, {2 * index} expanded, "
+            f"t={index / 1e6:f}s, 12345 KB]\n"
+        )
+        if index % 10 == 0:
+            f.write(f"New best heuristic value for h0: {index % 100}\n")
+
+
+def write_search_statistics(f):
+    for name, value in [
+        ("Expanded", 200000),
+        ("Reopened", 0),
+        ("Evaluated", 300000),
+        ("Generated", 900000),
+        ("Dead ends:", 12),
+        ("Expanded until last jump:", 190000),
+        ("Reopened until last jump:", 0),
+        ("Evaluated until last jump:", 290000),
+        ("Generated until last jump:", 880000),
+    ]:
+        f.write(f"{name} {value} state(s).\n")
+    f.write("Evaluations: 300000\nSearch time: 5.43s\nTotal time: 5.50s\n")
+
+
+def write_plan(f, cost):
+    f.write("Solution found!\nActual search time: 0.1s\n")
+    f.write(f"Plan length: {cost} step(s).\nPlan cost: {cost}\n")
+
+
+def write_footer(f):
+    f.write("Peak memory: 123456 KB\nsearch exit code: 0\n")
+    f.write("Planner time: 12.34s\n")
+
+
+def write_single_search_log(path, size, num_heuristics):
+    # Split the log into a translator and a search part of equal size.
+    num_lines = max(1, int(size / 2 / 60))
+    with open(path, "w") as f:
+        write_translator_log(f, num_lines)
+        write_search_header(f, num_heuristics)
+        write_progress(f, num_lines)
+        write_plan(f, 42)
+        write_search_statistics(f)
+        write_footer(f)
+
+
+def write_anytime_search_log(path, size, num_heuristics, num_iterations):
+    num_lines = max(1, int(size / 2 / 60))
+    lines_per_iteration = max(1, num_lines // num_iterations)
+    with open(path, "w") as f:
+        write_translator_log(f, num_lines)
+        write_search_header(f, num_heuristics)
+        for iteration in range(num_iterations):
+            write_progress(f, lines_per_iteration, iteration * lines_per_iteration)
+            write_plan(f, 1000 - iteration)
+            write_search_statistics(f)
+        write_footer(f)
+
+
+def make_run_dir(path, write_log):
+    os.makedirs(path)
+    write_log(os.path.join(path, "run.log"))
+    with open(os.path.join(path, "driver.log"), "w") as f:
+        f.write(DRIVER_LOG)
+    with open(os.path.join(path, "static-properties"), "w") as f:
+        f.write('{"id": ["algorithm", "domain", "problem"]}\n')
+
+
+def time_parser(run_dir, script, props_content, repetitions):
+    """Return the fastest time of parsing *run_dir* with *script*."""
+    props_file = os.path.join(run_dir, "properties")
+    times = []
+    for _ in range(repetitions):
+        with open(props_file, "w") as f:
+            f.write(props_content)
+        old_cwd = os.getcwd()
+        os.chdir(run_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start_time = time.perf_counter()
+                success = parser.run_parsers([str(SCRIPTS_DIR / script)])
+                times.append(time.perf_counter() - start_time)
+        finally:
+            os.chdir(old_cwd)
+        if not success:
+            sys.exit(f"{script} failed in {run_dir}")
+    return min(times)
+
+
+def benchmark(run_dir, scripts, selected_scripts, repetitions):
+    size = os.path.getsize(os.path.join(run_dir, "run.log")) / 2**20
+    props_content = "{}"
+    for script in scripts:
+        if selected_scripts is None or script in selected_scripts:
+            seconds = time_parser(run_dir, script, props_content, repetitions)
+            print(
+                f"{os.path.basename(run_dir):16} {script:26} "
+                f"{seconds:8.3f}s {size / seconds:10.1f} MiB/s"
+            )
+        else:
+            time_parser(run_dir, script, props_content, repetitions=1)
+        with open(os.path.join(run_dir, "properties")) as f:
+            props_content = f.read()
+
+
+def main():
+    args = parse_args()
+    tools.configure_logging()
+    size = int(args.size * 2**20)
+    tmp_dir = tempfile.mkdtemp(prefix="lab-parser-benchmark-")
+    try:
+        single_dir = os.path.join(tmp_dir, "single-search")
+        make_run_dir(
+            single_dir,
+            lambda path: write_single_search_log(path, size, args.heuristics),
+        )
+        anytime_dir = os.path.join(tmp_dir, "anytime-search")
+        make_run_dir(
+            anytime_dir,
+            lambda path: write_anytime_search_log(
+                path, size, args.heuristics, args.iterations
+            ),
+        )
+        benchmark(single_dir, SINGLE_SEARCH_PARSERS, args.parsers, args.repetitions)
+        benchmark(anytime_dir, ANYTIME_SEARCH_PARSERS, args.parsers, args.repetitions)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -128,10 +128,19 @@ class FastDownwardExperiment(Experiment):
     #: "planner_wall_clock_time", "score_planner_memory", "score_planner_time".
     PLANNER_PARSER = os.path.join(DOWNWARD_SCRIPTS_DIR, "planner-parser.py")
 
-    def __init__(self, path=None, environment=None, revision_cache=None):
+    def __init__(
+        self,
+        path=None,
+        environment=None,
+        revision_cache=None,
+        properties_codec="json",
+        parser_host=False,
+        durability="always",
+    ):
         """
         See :class:`lab.experiment.Experiment` for an explanation of
-        the *path* and *environment* parameters.
+        the *path*, *environment*, *properties_codec*, *parser_host*
+        and *durability* parameters.
 
         *revision_cache* is the directory for caching Fast Downward
         revisions. It defaults to ``<scriptdir>/data/revision-cache``.
@@ -155,7 +164,14 @@ class FastDownwardExperiment(Experiment):
         >>> exp.add_parser(exp.PLANNER_PARSER)
 
         """
-        Experiment.__init__(self, path=path, environment=environment)
+        Experiment.__init__(
+            self,
+            path=path,
+            environment=environment,
+            properties_codec=properties_codec,
+            parser_host=parser_host,
+            durability=durability,
+        )
 
         self.revision_cache = revision_cache or os.path.join(
             get_default_data_dir(), "revision-cache"
@@ -9,6 +9,21 @@ from downward import outcomes
 from lab.parser import Parser
 
 
+# Characters that str.splitlines() treats as line boundaries.
+LINE_BOUNDARIES = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def _find_line_start(content, prefix):
+    """Return True if a line in *content* starts with *prefix*."""
+    # Searching for the prefix is much faster than splitting large logs.
+    pos = content.find(prefix)
+    while pos != -1:
+        if pos == 0 or content[pos - 1] in LINE_BOUNDARIES:
+            return True
+        pos = content.find(prefix, pos + 1)
+    return False
+
+
 def parse_exit_code(content, props):
     """
     Convert the exitcode of the planner to a human-readable message and store
@@ -22,13 +37,10 @@ def parse_exit_code(content, props):
     assert "error" not in props
 
     # Check if Fast Downward uses the latest exit codes.
-    use_legacy_exit_codes = True
-    for line in content.splitlines():
-        if line.startswith("translate exit code:") or line.startswith(
-            "search exit code:"
-        ):
-            use_legacy_exit_codes = False
-            break
+    use_legacy_exit_codes = not any(
+        _find_line_start(content, prefix)
+        for prefix in ["translate exit code:", "search exit code:"]
+    )
 
     exitcode = props["planner_exit_code"]
     outcome = outcomes.get_outcome(exitcode, use_legacy_exit_codes)
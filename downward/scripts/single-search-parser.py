@@ -42,8 +42,10 @@ def check_single_search(content, props):
             "Single-search parser can't be used for iterated search."
         )
     for _, pattern, _ in PATTERNS:
-        results = re.findall(pattern, content)
-        if len(results) > 1:
+        regex = re.compile(pattern)
+        # Stop after the second match instead of finding all matches.
+        match = regex.search(content)
+        if match and regex.search(content, match.end()):
             props.add_unexplained_error(
                 f"Found multiple occurences of {pattern} in logfile. "
                 f"Single-search parser can't be used for anytime planner."
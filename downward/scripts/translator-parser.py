@@ -7,7 +7,7 @@ Regular expressions and functions for parsing translator logs.
 import ast
 import re
 
-from lab.parser import Parser
+from lab.parser import findall, Parser
 
 
 def parse_translator_timestamps(content, props):
@@ -21,10 +21,8 @@ def parse_translator_timestamps(content, props):
         Done! [6.860s CPU, 6.923s wall-clock]
 
     """
-    pattern = re.compile(
-        r"^(.+)(?:\.\.\.|:|!) \[(.+)s CPU, .+s wall-clock\]$", flags=re.M
-    )
-    for section, time in pattern.findall(content):
+    pattern = r"^(.+)(?:\.\.\.|:|!) \[(.+)s CPU, .+s wall-clock\]$"
+    for section, time in findall(pattern, content, flags=re.M):
         section = section.lower().replace(" ", "_")
         props[f"translator_time_{section}"] = float(time)
 
@@ -47,7 +45,7 @@ def parse_old_statistics(content, props):
         "axioms removed",
         "propositions removed",
     }
-    for count, name in re.findall(r"^(\d+) (.+)$", content, flags=re.M):
+    for count, name in findall(r"^(\d+) (.+)$", content, flags=re.M):
         if name in names:
             attribute = f"translator_{name.replace(' ', '_')}"
             props[attribute] = int(count)
@@ -59,8 +57,8 @@ def parse_statistics(content, props):
     Translator xxx: yyy
 
     """
-    pattern = re.compile(r"^Translator (.+): (\d+)(?: KB|)$", flags=re.M)
-    for name, count in pattern.findall(content):
+    pattern = r"^Translator (.+): (\d+)(?: KB|)$"
+    for name, count in findall(pattern, content, flags=re.M):
         attr = name.lower().replace(" ", "_")
         # Support strings, numbers, tuples, lists, dicts, Booleans, and None.
         props[f"translator_{attr}"] = ast.literal_eval(count)
@@ -1,8 +1,12 @@
+import codecs
 import errno
+import io
+import json
 import logging
 import os
 import resource
 import select
+import signal
 import subprocess
 import sys
 import time
@@ -10,9 +14,32 @@ import time
 from lab import tools
 
 
-def set_limit(kind, soft_limit, hard_limit):
+# File in the run dir that stores the resource usage of the commands.
+PROPERTIES_FILENAME = "call-properties"
+
+# Seconds between sending SIGTERM and SIGKILL to a command that is aborted.
+KILL_GRACE_PERIOD = 5
+
+# Timelines store at most twice this number of samples.
+TIMELINE_SAMPLES = 500
+
+# Maximum number of bytes that are moved from a pipe to a file at once.
+REDIRECT_BUFFER_SIZE = 2**20
+
+
+def set_limit(kind, soft_limit, hard_limit, pid=None):
+    """
+    Set the resource limit *kind* of the current process or, if *pid*
+    is given, of the process with this ID.
+    """
     try:
-        resource.setrlimit(kind, (soft_limit, hard_limit))
+        if pid is None:
+            resource.setrlimit(kind, (soft_limit, hard_limit))
+        else:
+            resource.prlimit(pid, kind, (soft_limit, hard_limit))
+    except ProcessLookupError:
+        # The process has already exited.
+        pass
     except (OSError, ValueError) as err:
         logging.error(
             f"Resource limit for {kind} could not be set to "
@@ -20,6 +47,268 @@ def set_limit(kind, soft_limit, hard_limit):
         )
 
 
+def _get_returncode(status):
+    """Convert a wait status to a return code like subprocess does."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _get_resource_usage_properties(name, rusage, wall_clock_time):
+    # Linux reports the peak RSS in KiB, macOS in bytes.
+    peak_rss = rusage.ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss //= 1024
+    return {
+        f"{name}_wall_clock_time": wall_clock_time,
+        f"{name}_cpu_time": rusage.ru_utime + rusage.ru_stime,
+        f"{name}_user_time": rusage.ru_utime,
+        f"{name}_system_time": rusage.ru_stime,
+        f"{name}_peak_rss": peak_rss,
+        f"{name}_block_input": rusage.ru_inblock,
+        f"{name}_block_output": rusage.ru_oublock,
+        f"{name}_voluntary_context_switches": rusage.ru_nvcsw,
+        f"{name}_involuntary_context_switches": rusage.ru_nivcsw,
+    }
+
+
+def _get_descendants(pid):
+    """
+    Return the IDs of all descendant processes of *pid*. Only works on
+    systems with a /proc file system and returns [] elsewhere.
+    """
+    children = {}
+    try:
+        proc_entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in proc_entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            # The process has exited in the meantime.
+            continue
+        # The second field is the command name in parentheses, which may
+        # contain spaces. The parent ID is the second field after it.
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    descendants = []
+    pids = [pid]
+    while pids:
+        pids = [child for parent in pids for child in children.get(parent, [])]
+        descendants.extend(pids)
+    return descendants
+
+
+def _read_process_usage(pid):
+    """
+    Return the resident set size and peak resident set size (in KiB)
+    and the CPU time (in clock ticks) of process *pid* from /proc or
+    None if the process is gone. The CPU time includes the children that
+    the process waited for.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            status = f.read()
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    rss = peak_rss = 0
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            peak_rss = int(line.split()[1])
+        elif line.startswith("VmRSS:"):
+            rss = int(line.split()[1])
+            break
+    # utime, stime, cutime and cstime are fields 14 to 17 of the stat
+    # file. The fields after the command name start with field 3.
+    fields = stat.rsplit(")", 1)[1].split()
+    return rss, peak_rss, sum(int(value) for value in fields[11:15])
+
+
+class _Sampler:
+    """
+    Periodically record the total memory usage and CPU time of a process
+    tree.
+
+    To keep the timeline compact for long runs, the sampler merges
+    pairs of samples whenever the timeline holds 2 * TIMELINE_SAMPLES
+    samples, keeping the maximum memory usage, and doubles the sampling
+    interval.
+    """
+
+    def __init__(self, pid, interval, start_time):
+        self.pid = pid
+        self.interval = interval
+        self.start_time = start_time
+        self.next_sample_time = start_time + interval
+        self.samples = []
+        # Maximum peak RSS of a single process in the tree, in KiB.
+        self.peak_rss = 0
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def get_timeout(self):
+        return max(0, self.next_sample_time - time.time())
+
+    def sample_if_due(self):
+        now = time.time()
+        if now < self.next_sample_time:
+            return
+        self.next_sample_time = now + self.interval
+        total_rss = total_ticks = 0
+        for pid in [self.pid] + _get_descendants(self.pid):
+            usage = _read_process_usage(pid)
+            if usage:
+                rss, peak_rss, ticks = usage
+                total_rss += rss
+                total_ticks += ticks
+                self.peak_rss = max(self.peak_rss, peak_rss)
+        self.samples.append(
+            [
+                round(now - self.start_time, 3),
+                total_rss,
+                round(total_ticks / self.clock_ticks, 2),
+            ]
+        )
+        if len(self.samples) >= 2 * TIMELINE_SAMPLES:
+            self.samples = [
+                [second[0], max(first[1], second[1]), second[2]]
+                for first, second in zip(self.samples[::2], self.samples[1::2])
+            ]
+            self.interval *= 2
+
+    def write(self, filename):
+        timeline = {
+            "columns": ["wall_clock_time", "rss", "cpu_time"],
+            "samples": self.samples,
+        }
+        with open(filename, "w") as f:
+            json.dump(timeline, f, separators=(",", ":"))
+            f.write("\n")
+
+
+def _open_pidfd(pid):
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # Python < 3.9 or Linux < 5.3.
+        return None
+
+
+def _get_fileno(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+class _CompressedFile:
+    """
+    Append the written bytes compressed to the file *path*. Each Call
+    adds a separate gzip member, xz stream or zstd frame, which the
+    readers of these formats decompress as one file. The file is only
+    created once output is written to it.
+    """
+
+    def __init__(self, path, compression, level, sync):
+        self.name = path
+        self.compressor = tools.get_compressor(compression, level)
+        self.sync = sync
+        self.file = None
+
+    def write(self, data):
+        if not data:
+            return
+        if self.file is None:
+            self.file = open(self.name, "ab")
+            _register_compressed_log(self.name)
+        self.file.write(self.compressor.compress(data))
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def finish(self):
+        """Write the end of the compressed data and sync it to disk."""
+        if self.file is not None and self.compressor is not None:
+            self.file.write(self.compressor.flush())
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+        self.compressor = None
+
+    def close(self):
+        self.finish()
+        if self.file is not None:
+            self.file.close()
+
+
+def _register_compressed_log(path):
+    """
+    Add *path* to the list of compressed logs in the current directory,
+    so parsers know that the log is split into a compressed and an
+    uncompressed part (see lab.tools.find_log_files()).
+    """
+    path = os.path.relpath(path)
+    try:
+        with open(tools.COMPRESSED_LOGS_FILENAME) as f:
+            if path in f.read().splitlines():
+                return
+    except FileNotFoundError:
+        pass
+    with open(tools.COMPRESSED_LOGS_FILENAME, "a") as f:
+        f.write(f"{path}\n")
+
+
+def sync_output_files(filenames):
+    """
+    Write the given files and their compressed variants (e.g.,
+    ``run.log.gz``) to disk if they exist.
+    """
+    for filename in filenames:
+        for path in [filename] + [
+            f"{filename}.{compression}" for compression in tools.PROPERTIES_COMPRESSIONS
+        ]:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+def _write_output(outfile, data, decoder):
+    if isinstance(outfile, _CompressedFile):
+        outfile.write(data)
+        return
+    out_fd = _get_fileno(outfile)
+    if out_fd is None:
+        outfile.write(decoder.decode(data, final=not data))
+    else:
+        _write_all(out_fd, data)
+
+
+def _write_properties(props):
+    call_props = tools.Properties(filename=PROPERTIES_FILENAME)
+    if call_props.codec is None:
+        # Use the format of the static properties for new files.
+        call_props.codec = tools.get_properties_codec("static-properties")
+    call_props.update(props)
+    call_props.write()
+
+
 class Call:
     def __init__(
         self,
@@ -31,6 +320,13 @@ class Call:
         hard_stdout_limit=None,
         soft_stderr_limit=None,
         hard_stderr_limit=None,
+        tail_stdout_limit=None,
+        tail_stderr_limit=None,
+        wall_clock_time_limit=None,
+        sample_interval=None,
+        compression=None,
+        compression_level=None,
+        sync_output=True,
         **kwargs,
     ):
         """Make system calls with time and memory constraints.
@@ -41,63 +337,257 @@ class Call:
         See also the documentation for
         ``lab.experiment._Buildable.add_command()``.
 
+        If the command runs longer than *wall_clock_time_limit* seconds,
+        it and all of its child processes receive SIGTERM and, if they
+        are still running after :py:data:`KILL_GRACE_PERIOD` seconds,
+        SIGKILL. If *wall_clock_time_limit* is None, it defaults to 1.5
+        times the *time_limit*, but at least 30 seconds.
+
+        If *sample_interval* is given, the total memory usage (RSS in
+        KiB) and CPU time (in seconds) of the command and its child
+        processes are sampled from /proc every *sample_interval* seconds
+        and stored in the file ``<name>-timeline.json`` (Linux only).
+        Long timelines are downsampled, keeping the memory peaks.
+
+        If *tail_stdout_limit* (or *tail_stderr_limit*) is given, a
+        command that reaches the hard output limit is not aborted.
+        Instead, only the last *tail_stdout_limit* KiB of the remaining
+        output are kept and written after the first *hard_stdout_limit*
+        KiB, separated by a line that states the number of omitted
+        bytes. The first partial line of the kept output is omitted as
+        well. The number of omitted bytes is stored in
+        "<name>_omitted_stdout_bytes" (or "<name>_omitted_stderr_bytes").
+
+        If *compression* is "gz", "xz" or "zst", the redirected stdout
+        and stderr output is compressed with the given
+        *compression_level* (None for the default level) while it is
+        written and appended to a compressed variant of the output file,
+        e.g., ``run.log.gz`` instead of ``run.log``. The output limits
+        still apply to the uncompressed output.
+
+        If *sync_output* is True, the redirected output is written to
+        disk with os.fsync() after the command finishes, so it survives
+        a crash of the machine before the next command starts.
+
+        After the command finishes, its resource usage is written to the
+        ``call-properties`` file in the current directory, e.g., as
+        "<name>_cpu_time" (user and system time in seconds) and
+        "<name>_peak_rss" (in KiB). The values include all child
+        processes of the command that it waited for. On Linux, the peak
+        RSS reported by the kernel is at least the peak RSS of the
+        Python process that starts the command (about 15 MiB for run
+        scripts), since it includes the memory of the process before
+        it executes the command. If the reported value doesn't exceed
+        this floor and *sample_interval* is given, the largest peak RSS
+        of a single process read from /proc during sampling is used
+        instead. If the command has
+        been aborted because it exceeded the wall-clock time limit or a
+        hard output limit, "<name>_kill_reason" holds the name of the
+        exceeded limit.
+
         """
         assert "stdin" not in kwargs, "redirecting stdin is not supported"
         self.name = name
 
-        if time_limit is None:
+        if wall_clock_time_limit is not None:
+            self.wall_clock_time_limit = wall_clock_time_limit
+        elif time_limit is None:
             self.wall_clock_time_limit = None
         else:
             # Enforce miminum on wall-clock limit to account for disk latencies.
             self.wall_clock_time_limit = max(30, time_limit * 1.5)
+        self.kill_reason = None
+        self.kill_time = None
+        self.terminated_pids = set()
+        self.omitted_bytes = {}
+        self.sync_output = sync_output
+        # os.splice() is available on Linux since Python 3.10.
+        self.use_splice = hasattr(os, "splice")
 
         def get_bytes(limit):
             return None if limit is None else int(limit * 1024)
 
         # Allow passing filenames instead of file handles.
         self.opened_files = []
+        compressed_files = {}
         for stream_name in ["stdout", "stderr"]:
             stream = kwargs.get(stream_name)
-            if isinstance(stream, str):
+            if stream and compression:
+                path = f"{getattr(stream, 'name', stream)}.{compression}"
+                if path not in compressed_files:
+                    file = _CompressedFile(
+                        path, compression, compression_level, sync_output
+                    )
+                    compressed_files[path] = file
+                    self.opened_files.append(file)
+                kwargs[stream_name] = compressed_files[path]
+            elif isinstance(stream, str):
                 file = open(stream, mode="w")
                 kwargs[stream_name] = file
                 self.opened_files.append(file)
 
         # Allow redirecting and limiting the output to streams.
         self.redirected_streams_and_limits = {}
-        for stream_name, soft_limit, hard_limit in [
-            ("stdout", get_bytes(soft_stdout_limit), get_bytes(hard_stdout_limit)),
-            ("stderr", get_bytes(soft_stderr_limit), get_bytes(hard_stderr_limit)),
+        for stream_name, soft_limit, hard_limit, tail_limit in [
+            ("stdout", soft_stdout_limit, hard_stdout_limit, tail_stdout_limit),
+            ("stderr", soft_stderr_limit, hard_stderr_limit, tail_stderr_limit),
         ]:
             stream = kwargs.pop(stream_name, None)
             if stream:
                 self.redirected_streams_and_limits[stream_name] = (
                     stream,
-                    (soft_limit, hard_limit),
+                    (
+                        get_bytes(soft_limit),
+                        get_bytes(hard_limit),
+                        get_bytes(tail_limit),
+                    ),
                 )
                 kwargs[stream_name] = subprocess.PIPE
 
+        # When the soft time limit is reached, SIGXCPU is emitted. Once we
+        # reach the higher hard time limit, SIGKILL is sent. Having some
+        # padding between the two limits allows programs to handle SIGXCPU.
+        limits = []
+        if time_limit is not None:
+            limits.append((resource.RLIMIT_CPU, time_limit, time_limit + 5))
+        if memory_limit is not None:
+            _, hard_mem_limit = resource.getrlimit(resource.RLIMIT_AS)
+            # Convert memory from MiB to Bytes.
+            limits.append(
+                (resource.RLIMIT_AS, memory_limit * 1024 * 1024, hard_mem_limit)
+            )
+        limits.append((resource.RLIMIT_CORE, 0, 0))
+
         def prepare_call():
-            # When the soft time limit is reached, SIGXCPU is emitted. Once we
-            # reach the higher hard time limit, SIGKILL is sent. Having some
-            # padding between the two limits allows programs to handle SIGXCPU.
-            if time_limit is not None:
-                set_limit(resource.RLIMIT_CPU, time_limit, time_limit + 5)
-            if memory_limit is not None:
-                _, hard_mem_limit = resource.getrlimit(resource.RLIMIT_AS)
-                # Convert memory from MiB to Bytes.
-                set_limit(
-                    resource.RLIMIT_AS, memory_limit * 1024 * 1024, hard_mem_limit
-                )
-            set_limit(resource.RLIMIT_CORE, 0, 0)
+            for limit in limits:
+                set_limit(*limit)
 
+        # Popen only uses vfork() or posix_spawn() instead of the slower
+        # fork() if no preexec_fn is given, which is also unsafe in threaded
+        # programs. Therefore, we set the limits of the child process with
+        # prlimit() right after it has been started where possible (Linux).
+        # Popen returns after the child has called exec(), so the command
+        # only runs for a few microseconds without limits.
+        use_prlimit = hasattr(resource, "prlimit")
         try:
-            self.process = subprocess.Popen(args, preexec_fn=prepare_call, **kwargs)
+            if use_prlimit:
+                self.process = subprocess.Popen(args, **kwargs)
+            else:
+                self.process = subprocess.Popen(args, preexec_fn=prepare_call, **kwargs)
         except OSError as err:
             if err.errno == errno.ENOENT:
                 sys.exit(f'Error: Call {name} failed. "{args[0]}" not found.')
             else:
                 raise
+        if use_prlimit:
+            for limit in limits:
+                set_limit(*limit, pid=self.process.pid)
+        self.wall_clock_start_time = time.time()
+        # The peak RSS of the command is at least our own peak RSS.
+        own_usage = _read_process_usage(os.getpid())
+        self.peak_rss_floor = own_usage[1] if own_usage else None
+        if sample_interval and os.path.isdir("/proc"):
+            self.sampler = _Sampler(
+                self.process.pid, sample_interval, self.wall_clock_start_time
+            )
+        else:
+            self.sampler = None
+
+    def _terminate(self, reason):
+        """
+        Send SIGTERM to the process and its descendants, and remember to
+        send SIGKILL after the grace period.
+        """
+        if self.kill_reason is not None:
+            return
+        self.kill_reason = reason
+        self.kill_time = time.time() + KILL_GRACE_PERIOD
+        # Remember the descendants, since they lose their parent if the
+        # process exits before them.
+        self.terminated_pids = {self.process.pid} | set(
+            _get_descendants(self.process.pid)
+        )
+        self._signal(self.terminated_pids, signal.SIGTERM)
+
+    def _signal(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                # The process has exited in the meantime.
+                pass
+
+    def _enforce_wall_clock_limit(self):
+        now = time.time()
+        if (
+            self.kill_reason is None
+            and self.wall_clock_time_limit is not None
+            and now - self.wall_clock_start_time > self.wall_clock_time_limit
+        ):
+            logging.error(
+                f"{self.name} exceeded wall-clock time limit of "
+                f"{self.wall_clock_time_limit}s -> abort command"
+            )
+            self._terminate("wall_clock_time_limit")
+        elif self.kill_time is not None and now >= self.kill_time:
+            logging.error(f"{self.name} still running -> send SIGKILL")
+            # The process itself is not reaped yet, so its ID is not reused.
+            pids = self.terminated_pids | set(_get_descendants(self.process.pid))
+            self._signal(pids, signal.SIGKILL)
+            self.kill_time = None
+
+    def _handle_timers(self):
+        self._enforce_wall_clock_limit()
+        if self.sampler:
+            self.sampler.sample_if_due()
+
+    def _get_timeout(self):
+        """
+        Return the seconds until the next limit must be enforced or the
+        next sample must be taken, or None.
+        """
+        timeouts = []
+        if self.kill_time is not None:
+            timeouts.append(self.kill_time - time.time())
+        elif self.kill_reason is None and self.wall_clock_time_limit is not None:
+            timeouts.append(
+                self.wall_clock_start_time + self.wall_clock_time_limit - time.time()
+            )
+        if self.sampler:
+            timeouts.append(self.sampler.get_timeout())
+        if not timeouts:
+            return None
+        # Add a millisecond to avoid waking up too early.
+        return max(0, min(timeouts)) + 0.001
+
+    def _move_output(self, fd, outfile, decoder, max_bytes):
+        """
+        Move at most *max_bytes* bytes from the pipe *fd* to *outfile*
+        and return the number of moved bytes (0 at the end of the output).
+
+        If possible, move the bytes directly from the pipe to the file
+        with os.splice(), so they never enter user space. Otherwise,
+        write them to the file descriptor of *outfile* without decoding
+        them. Only for streams without file descriptor, decode the bytes
+        with *decoder*, which handles characters that span two chunks.
+        Compressed files receive the bytes through their write() method.
+        """
+        out_fd = _get_fileno(outfile)
+        if (
+            out_fd is not None
+            and self.use_splice
+            and not isinstance(outfile, _CompressedFile)
+        ):
+            try:
+                return os.splice(fd, out_fd, max_bytes)
+            except OSError as err:
+                # Some files (e.g., opened with O_APPEND) don't support splice.
+                if err.errno not in [errno.EINVAL, errno.ENOSYS]:
+                    raise
+                self.use_splice = False
+        data = os.read(fd, max_bytes)
+        _write_output(outfile, data, decoder)
+        return len(data)
 
     def _redirect_streams(self):
         """
@@ -109,12 +599,20 @@ class Call:
         parameters to Popen, but neither Popen.wait() nor
         Popen.communicate() allow limiting the redirected output.
 
+        The output is copied as bytes (see :meth:`_move_output`) and
+        counted for the output limits. Streams with a tail limit keep
+        the end of the output that exceeds the hard limit in a ring
+        buffer and append it after the process closes the stream.
+
         Code adapted from the Python 2 version of subprocess.py.
         """
         fd_to_infile = {}
         fd_to_outfile = {}
         fd_to_limits = {}
         fd_to_bytes = {}
+        fd_to_stream_name = {}
+        fd_to_decoder = {}
+        fd_to_tail = {}
 
         poller = select.poll()
 
@@ -139,47 +637,96 @@ class Call:
             fd = old_stream.fileno()
             fd_to_outfile[fd] = new_stream
             fd_to_limits[fd] = limits
+            fd_to_stream_name[fd] = stream_name
+            fd_to_decoder[fd] = codecs.getincrementaldecoder(tools.DEFAULT_ENCODING)(
+                errors="replace"
+            )
+            # Write buffered text before writing to the file descriptor.
+            new_stream.flush()
 
         while fd_to_infile:
+            timeout = self._get_timeout()
             try:
-                ready = poller.poll()
+                ready = poller.poll(None if timeout is None else timeout * 1000)
             except OSError as e:
                 if e.args[0] == errno.EINTR:
                     continue
                 raise
+            self._handle_timers()
 
             for fd, mode in ready:
-                if mode & select_POLLIN_POLLPRI:
-                    data = os.read(fd, 4096)
+                if not mode & select_POLLIN_POLLPRI:
+                    # Ignore hang up or errors.
+                    close_unregister_and_remove(fd)
+                    continue
+                outfile = fd_to_outfile[fd]
+                _, hard_limit, tail_limit = fd_to_limits[fd]
+                if (
+                    outfile is not None
+                    and tail_limit is not None
+                    and hard_limit is not None
+                    and fd_to_bytes[fd] >= hard_limit
+                ):
+                    data = os.read(fd, REDIRECT_BUFFER_SIZE)
                     if not data:
                         close_unregister_and_remove(fd)
-                    if fd_to_outfile[fd]:
-                        outfile = fd_to_outfile[fd]
-                        _, hard_limit = fd_to_limits[fd]
-                        if (
-                            hard_limit is not None
-                            and fd_to_bytes[fd] + len(data) > hard_limit
-                        ):
-                            # Don't write to this outfile in subsequent rounds.
-                            fd_to_outfile[fd] = None
-                            logging.error(
-                                f"{self.name} wrote {hard_limit / 1024} KiB (hard limit) "
-                                f"to {outfile.name} -> abort command"
-                            )
-                            self.process.terminate()
-                            # Strip extra bytes.
-                            data = data[: hard_limit - fd_to_bytes[fd]]
-                        outfile.write(tools.get_string(data))
-                        fd_to_bytes[fd] += len(data)
-                else:
-                    # Ignore hang up or errors.
+                        continue
+                    if fd not in fd_to_tail:
+                        fd_to_tail[fd] = bytearray()
+                        logging.warning(
+                            f"{self.name} wrote {hard_limit / 1024} KiB (hard limit) "
+                            f"to {outfile.name} -> keep only the last "
+                            f"{tail_limit / 1024} KiB of the remaining output"
+                        )
+                    # Keep the last tail_limit bytes in the ring buffer.
+                    tail = fd_to_tail[fd]
+                    tail += data
+                    del tail[: max(0, len(tail) - tail_limit)]
+                    fd_to_bytes[fd] += len(data)
+                    continue
+                if outfile is None or fd_to_bytes[fd] == hard_limit:
+                    # Discard output that exceeds the hard limit.
+                    if not os.read(fd, REDIRECT_BUFFER_SIZE):
+                        close_unregister_and_remove(fd)
+                    elif outfile is not None:
+                        # Don't write to this outfile in subsequent rounds.
+                        fd_to_outfile[fd] = None
+                        logging.error(
+                            f"{self.name} wrote {hard_limit / 1024} KiB (hard limit) "
+                            f"to {outfile.name} -> abort command"
+                        )
+                        self._terminate(f"hard_{fd_to_stream_name[fd]}_limit")
+                    continue
+                max_bytes = REDIRECT_BUFFER_SIZE
+                if hard_limit is not None:
+                    max_bytes = min(max_bytes, hard_limit - fd_to_bytes[fd])
+                moved_bytes = self._move_output(
+                    fd, outfile, fd_to_decoder[fd], max_bytes
+                )
+                if not moved_bytes:
                     close_unregister_and_remove(fd)
+                fd_to_bytes[fd] += moved_bytes
+
+        for fd, tail in fd_to_tail.items():
+            _, hard_limit, _ = fd_to_limits[fd]
+            omitted_bytes = fd_to_bytes[fd] - hard_limit - len(tail)
+            if omitted_bytes:
+                # Omit the first line, which is usually incomplete.
+                line_end = tail.find(b"\n") + 1
+                omitted_bytes += line_end
+                stream_name = fd_to_stream_name[fd]
+                self.omitted_bytes[stream_name] = omitted_bytes
+                separator = (
+                    f"\n[... {omitted_bytes} bytes of {stream_name} omitted ...]\n"
+                )
+                tail[:line_end] = separator.encode()
+            _write_output(fd_to_outfile[fd], bytes(tail), fd_to_decoder[fd])
 
         # Check soft limit.
         for fd, outfile in fd_to_outfile.items():
             # Ignore streams that exceeded the hard limit.
             if outfile is not None:
-                soft_limit, _ = fd_to_limits[fd]
+                soft_limit, _, _ = fd_to_limits[fd]
                 bytes_written = fd_to_bytes[fd]
                 if soft_limit is not None and bytes_written > soft_limit:
                     logging.error(
@@ -187,22 +734,74 @@ class Call:
                         f"to {outfile.name} (soft limit: {soft_limit / 1024} KiB)"
                     )
 
+    def _wait_for_process(self):
+        """Wait for the process and return its resource usage."""
+        # We can't use Popen.wait(), since it discards the resource usage.
+        pidfd = None
+        delay = 0.001
+        while True:
+            timeout = self._get_timeout()
+            if timeout is None:
+                _, status, rusage = os.wait4(self.process.pid, 0)
+                break
+            pid, status, rusage = os.wait4(self.process.pid, os.WNOHANG)
+            if pid:
+                break
+            if pidfd is None:
+                pidfd = _open_pidfd(self.process.pid)
+            if pidfd is None:
+                # Poll with increasing delays.
+                delay = min(2 * delay, 0.1)
+                time.sleep(min(delay, timeout))
+            else:
+                select.select([pidfd], [], [], timeout)
+            self._handle_timers()
+        if pidfd is not None:
+            os.close(pidfd)
+        self.process.returncode = _get_returncode(status)
+        return rusage
+
     def wait(self):
-        wall_clock_start_time = time.time()
         self._redirect_streams()
-        retcode = self.process.wait()
+        rusage = self._wait_for_process()
+        retcode = self.process.returncode
         for stream, _ in self.redirected_streams_and_limits.values():
             # Write output to disk before the next Call starts.
-            stream.flush()
-            os.fsync(stream.fileno())
+            if isinstance(stream, _CompressedFile):
+                stream.finish()
+            else:
+                stream.flush()
+                if self.sync_output:
+                    os.fsync(stream.fileno())
 
         # Close files that were opened in the constructor.
         for file in self.opened_files:
             file.close()
-        wall_clock_time = time.time() - wall_clock_start_time
+        wall_clock_time = time.time() - self.wall_clock_start_time
         logging.info(f"{self.name} wall-clock time: {wall_clock_time:.2f}s")
+        props = _get_resource_usage_properties(self.name, rusage, wall_clock_time)
+        peak_rss_key = f"{self.name}_peak_rss"
+        if (
+            self.sampler
+            and self.sampler.peak_rss
+            and self.peak_rss_floor is not None
+            and props[peak_rss_key] <= self.peak_rss_floor
+        ):
+            props[peak_rss_key] = self.sampler.peak_rss
+        logging.info(
+            f"{self.name} CPU time: {props[f'{self.name}_cpu_time']:.2f}s, "
+            f"peak RSS: {props[f'{self.name}_peak_rss']} KiB"
+        )
+        if self.kill_reason is not None:
+            props[f"{self.name}_kill_reason"] = self.kill_reason
+        for stream_name, omitted_bytes in self.omitted_bytes.items():
+            props[f"{self.name}_omitted_{stream_name}_bytes"] = omitted_bytes
+        _write_properties(props)
+        if self.sampler:
+            self.sampler.write(f"{self.name}-timeline.json")
         if (
-            self.wall_clock_time_limit is not None
+            self.kill_reason is None
+            and self.wall_clock_time_limit is not None
             and wall_clock_time > self.wall_clock_time_limit
         ):
             logging.error(
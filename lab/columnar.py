@@ -0,0 +1,189 @@
+"""
+Columnar sidecar files for the ``properties`` file of evaluation directories.
+
+Parsing the JSON properties file of a large experiment takes a long time.
+Therefore, the fetcher additionally writes a ``properties.columns`` file
+that stores the same data column by column: one typed array per
+attribute, a string table for each string attribute and an index of the
+run IDs. Reports load this file instead of the JSON file if it is up to
+date.
+
+The file consists of a magic line, the length of the JSON header
+(8 bytes), the header itself and the binary blocks of all columns.
+Each block holds one byte per run that tells whether the run has a
+value for the attribute, followed by the values of these runs.
+"""
+
+from array import array
+import logging
+import os
+import struct
+import sys
+
+from lab import tools
+
+
+MAGIC = b"LABCOLUMNS 1\n"
+SUFFIX = ".columns"
+
+# Array type codes of the columns that are stored as binary arrays. String
+# columns store indices into their string table.
+_ARRAY_TYPES = {"int": "q", "float": "d", "str": "q"}
+_MIN_INT = -(2**63)
+_MAX_INT = 2**63 - 1
+
+
+def get_sidecar_filename(props_file):
+    return props_file + SUFFIX
+
+
+def _get_source_signature(props_file):
+    stat = os.stat(props_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _get_column_kind(values):
+    types = {type(value) for value in values}
+    if types == {bool}:
+        return "bool"
+    elif types == {int} and all(_MIN_INT <= value <= _MAX_INT for value in values):
+        return "int"
+    elif types == {float}:
+        return "float"
+    elif types == {str}:
+        return "str"
+    else:
+        # Store lists, dictionaries, None and mixed columns as JSON.
+        return "json"
+
+
+def _to_little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _encode_column(kind, values):
+    """Return the encoded *values* and extra metadata for the header."""
+    if kind == "bool":
+        return bytes(values), {}
+    elif kind == "json":
+        content = _dumps(values)
+        return tools.get_bytes(content), {}
+    elif kind == "str":
+        strings = sorted(set(values))
+        codes = {string: code for code, string in enumerate(strings)}
+        values = [codes[value] for value in values]
+        metadata = {"strings": strings}
+    else:
+        metadata = {}
+    return _to_little_endian(array(_ARRAY_TYPES[kind], values)).tobytes(), metadata
+
+
+def _decode_column(kind, data, column, shared_values):
+    if kind == "bool":
+        return [bool(value) for value in data]
+    elif kind == "json":
+        values = tools.json.loads(tools.get_string(data))
+        return [shared_values.share(value) for value in values]
+    values = array(_ARRAY_TYPES[kind])
+    values.frombytes(data)
+    values = _to_little_endian(values)
+    if kind == "str":
+        strings = column["strings"]
+        return [strings[code] for code in values]
+    else:
+        return values.tolist()
+
+
+def _dumps(values):
+    return tools.json.dumps(
+        values, cls=tools.Properties._PropertiesEncoder, separators=(",", ":")
+    )
+
+
+def write_columns(props):
+    """
+    Write a columnar sidecar file for the properties *props*. The
+    properties must have been written to ``props.filename`` before.
+    """
+    run_ids = sorted(props)
+    runs = [props[run_id] for run_id in run_ids]
+    attributes = sorted({attribute for run in runs for attribute in run})
+    columns = {}
+    blocks = []
+    offset = 0
+    for attribute in attributes:
+        present = bytes(int(attribute in run) for run in runs)
+        values = [run[attribute] for run in runs if attribute in run]
+        kind = _get_column_kind(values)
+        data, metadata = _encode_column(kind, values)
+        columns[attribute] = dict(
+            kind=kind, offset=offset, length=len(present) + len(data), **metadata
+        )
+        blocks.extend([present, data])
+        offset += len(present) + len(data)
+
+    header = tools.get_bytes(
+        _dumps(
+            {
+                "source": _get_source_signature(props.filename),
+                "run_ids": run_ids,
+                "columns": columns,
+            }
+        )
+    )
+    filename = get_sidecar_filename(props.filename)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp_filename, filename)
+
+
+def read_columns(props_file, attributes=None):
+    """
+    Load the properties from the columnar sidecar file of *props_file*.
+
+    If *attributes* is given, only load these attributes. Return None if
+    there is no sidecar file or if it is older than *props_file*. Equal
+    strings are shared between runs (see :py:class:`lab.tools.SharedValues`).
+    """
+    filename = get_sidecar_filename(props_file)
+    if not os.path.exists(filename) or not os.path.exists(props_file):
+        return None
+    with open(filename, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            logging.warning(f"Ignoring {filename} since it has an unknown format.")
+            return None
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = tools.json.loads(tools.get_string(f.read(header_length)))
+        if header["source"] != _get_source_signature(props_file):
+            logging.info(f"Ignoring {filename} since it is outdated.")
+            return None
+        data_start = f.tell()
+
+        runs = [{} for _ in header["run_ids"]]
+        # Store equal strings of JSON columns only once. String columns
+        # share their values through the string table anyway.
+        shared_values = tools.SharedValues()
+        for attribute, column in header["columns"].items():
+            if attributes is not None and attribute not in attributes:
+                continue
+            f.seek(data_start + column["offset"])
+            block = f.read(column["length"])
+            present = block[: len(runs)]
+            values = _decode_column(
+                column["kind"], block[len(runs) :], column, shared_values
+            )
+            present_runs = [run for run, flag in zip(runs, present) if flag]
+            for run, value in zip(present_runs, values):
+                run[attribute] = value
+
+    props = tools.Properties()
+    props.filename = props_file
+    props.update(zip(header["run_ids"], runs))
+    return props
@@ -1,13 +1,17 @@
 """Main module for creating experiments."""
 
 from collections import OrderedDict
+import contextlib
+import functools
 from glob import glob
+import hashlib
 import logging
 import os
 import subprocess
 import sys
+import time
 
-from lab import environments, tools
+from lab import environments, parser, tools
 from lab.fetcher import Fetcher
 from lab.steps import get_step, get_steps_text, Step
 
@@ -32,6 +36,11 @@ steps_group.add_argument(
 
 STATIC_EXPERIMENT_PROPERTIES_FILENAME = "static-experiment-properties"
 STATIC_RUN_PROPERTIES_FILENAME = "static-properties"
+PARSER_HOST_COMMAND_NAME = "parsers"
+PARSE_MANIFEST_FILENAME = "parse-manifest"
+
+# When to write the output of the commands to disk (see Experiment).
+DURABILITY_MODES = ["always", "end", "never"]
 
 
 def get_default_data_dir():
@@ -76,6 +85,157 @@ def _check_name(name, typ, extra_chars=""):
         )
 
 
+def _run_parsers(run_dir, parser_commands, parsers, in_process):
+    """Run the parsers in *run_dir* and return an error message or None."""
+    if in_process:
+        old_cwd = os.getcwd()
+        os.chdir(run_dir)
+        try:
+            # Suppress the parser output like for parser processes.
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    if not parser.run_parsers(parsers):
+                        return f"Parsing {run_dir} failed"
+        finally:
+            os.chdir(old_cwd)
+    else:
+        for parser_command in parser_commands:
+            # Since parsers often produce output which we would rather
+            # not want to see for each individual run, we suppress it here.
+            try:
+                subprocess.check_call(
+                    parser_command, cwd=run_dir, stdout=subprocess.DEVNULL
+                )
+            except subprocess.CalledProcessError as err:
+                return f"Parsing {run_dir} failed: {err}"
+    return None
+
+
+def _parse_run_dir(run_dir, parser_commands, parsers, in_process):
+    """
+    Parse *run_dir* again. Return an error message or None, whether the
+    run has been parsed and whether the parsers wrote a profile.
+    """
+    for filename in ["properties", PARSE_MANIFEST_FILENAME, parser.PROFILE_FILENAME]:
+        if os.path.exists(os.path.join(run_dir, filename)):
+            tools.remove_path(os.path.join(run_dir, filename))
+    error = _run_parsers(run_dir, parser_commands, parsers, in_process)
+    return error, True, _has_profile(run_dir)
+
+
+def _has_profile(run_dir):
+    return os.path.exists(os.path.join(run_dir, parser.PROFILE_FILENAME))
+
+
+def _get_file_hash(path):
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(functools.partial(f.read, 2**20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _get_parser_inputs(run_dir, old_inputs):
+    """
+    Return the size, modification time and content hash of all files in
+    *run_dir* that parsers may read. Only hash files again whose size or
+    modification time differs from *old_inputs*.
+    """
+    inputs = {}
+    for entry in os.scandir(run_dir):
+        if (
+            not entry.is_file()
+            or entry.name in [PARSE_MANIFEST_FILENAME, parser.PROFILE_FILENAME]
+            or entry.name.split(".")[0] == "properties"
+        ):
+            continue
+        stat = entry.stat()
+        signature = [stat.st_size, stat.st_mtime_ns]
+        old_input = old_inputs.get(entry.name)
+        if old_input and old_input[:2] == signature:
+            inputs[entry.name] = old_input
+        else:
+            inputs[entry.name] = signature + [_get_file_hash(entry.path)]
+    return inputs
+
+
+def _get_content_hashes(inputs):
+    return {filename: signature[2] for filename, signature in inputs.items()}
+
+
+def _parse_run_dir_incrementally(run_dir, parsers, parser_hashes, in_process):
+    """
+    Run the parsers in *run_dir* whose results may be outdated. Return an
+    error message or None, whether the run has been parsed and whether
+    the parsers wrote a profile.
+
+    The parse manifest stores the hashes of the parsers and of the files
+    in the run dir, and the changes that each parser made to the
+    properties. If the files changed, we run all parsers again.
+    Otherwise, we restore the properties from before the first changed
+    parser and run this parser and all later ones, since parsers may use
+    the properties of the previous parsers.
+    """
+    manifest_file = os.path.join(run_dir, PARSE_MANIFEST_FILENAME)
+    manifest = tools.Properties(filename=manifest_file, codec="compact-json")
+    old_records = manifest.get("parsers", [])
+    old_inputs = manifest.get("inputs", {})
+    inputs = _get_parser_inputs(run_dir, old_inputs)
+    first_stale = 0
+    if _get_content_hashes(inputs) == _get_content_hashes(old_inputs):
+        for record, rel_parser, parser_hash in zip(old_records, parsers, parser_hashes):
+            if record["parser"] != rel_parser or record["hash"] != parser_hash:
+                break
+            first_stale += 1
+    if first_stale == len(parsers) == len(old_records):
+        if inputs != old_inputs:
+            manifest["inputs"] = inputs
+            manifest.write()
+        return None, False, False
+
+    # Remove the manifest first, since the properties will be outdated
+    # if a parser fails.
+    if os.path.exists(manifest_file):
+        tools.remove_path(manifest_file)
+    props = parser._load_run_properties(run_dir)
+    props.clear()
+    for record in old_records[:first_stale]:
+        props.update(record["changed"])
+        for attribute in record["removed"]:
+            del props[attribute]
+    props.write()
+
+    records = old_records[:first_stale]
+    old_props = dict(props)
+    for rel_parser, parser_hash in zip(
+        parsers[first_stale:], parser_hashes[first_stale:]
+    ):
+        command = [tools.get_python_executable(), rel_parser]
+        error = _run_parsers(run_dir, [command], [rel_parser], in_process)
+        if error:
+            return error, True, False
+        new_props = dict(parser._load_run_properties(run_dir))
+        records.append(
+            {
+                "parser": rel_parser,
+                "hash": parser_hash,
+                "changed": {
+                    attribute: value
+                    for attribute, value in new_props.items()
+                    if attribute not in old_props or old_props[attribute] != value
+                },
+                "removed": [
+                    attribute for attribute in old_props if attribute not in new_props
+                ],
+            }
+        )
+        old_props = new_props
+    manifest.clear()
+    manifest.update(parsers=records, inputs=inputs)
+    manifest.write()
+    return None, True, _has_profile(run_dir)
+
+
 class _Resource:
     def __init__(self, name, source, dest, symlink, is_parser):
         self.name = name
@@ -210,6 +370,28 @@ class _Buildable:
         The command is aborted with SIGKILL when it uses more than
         *memory_limit* MiB.
 
+        Commands that block or sleep don't use CPU time. Therefore, the
+        command and its child processes are also sent SIGTERM when they
+        run longer than 1.5 times the *time_limit* (at least 30 seconds)
+        in wall-clock time, and SIGKILL five seconds later. Pass the
+        *wall_clock_time_limit* keyword argument (in seconds) to use a
+        different wall-clock limit. The reason for aborting a command is
+        stored in the "<name>_kill_reason" property.
+
+        To see how the memory usage and CPU time of a command evolve,
+        pass the *sample_interval* keyword argument (in seconds). The
+        command and its child processes are then sampled regularly and
+        the timeline is written to ``<name>-timeline.json`` in the run
+        dir (Linux only).
+
+        The resource usage of each command, e.g., its CPU time and peak
+        memory usage, is stored in the "<name>_cpu_time" and
+        "<name>_peak_rss" properties. On Linux, the kernel reports at
+        least the peak memory usage of the run script (about 15 MiB) as
+        the peak RSS. For commands that need less memory, pass
+        *sample_interval* to use the peak memory usage read from /proc
+        instead.
+
         You can limit the log size (in KiB) with a soft and hard limit
         for both stdout and stderr. When the soft limit is hit, an
         unexplained error is registered for this run, but the command is
@@ -217,9 +399,41 @@ class _Buildable:
         command is killed with SIGTERM. This signal can be caught and
         handled by the process.
 
+        If the end of the output matters, e.g., because it contains
+        statistics that the parsers need, pass *tail_stdout_limit* (and
+        *tail_stderr_limit*) in KiB. Commands that hit the hard limit are
+        then allowed to continue running, and the last
+        *tail_stdout_limit* KiB of their remaining output are appended to
+        the log after a line that states the number of omitted bytes.
+        The log thus holds at most the hard limit plus the tail limit,
+        and the number of omitted bytes is stored in the
+        "<name>_omitted_stdout_bytes" property.
+
+        >>> exp = Experiment()
+        >>> run = exp.add_run()
+        >>> run.add_command(
+        ...     "chatty-solver",
+        ...     ["mysolver", "input-file"],
+        ...     hard_stdout_limit=10 * 1024,
+        ...     tail_stdout_limit=1024,
+        ... )
+
         By default, there are limits for the log and error output, but
         time and memory are not restricted.
 
+        To reduce the size of the logs and the amount of data written to
+        the file system during the run, pass ``compression="gz"``,
+        ``"xz"`` or ``"zst"`` and optionally a *compression_level*. The
+        output of the command is then compressed while it is written to
+        ``run.log.gz`` and ``run.err.gz`` (or ``.xz`` or ``.zst``), and
+        the output limits apply to the uncompressed size. Parsers read
+        the compressed logs transparently. Writing ".zst" files requires
+        the ``zstandard`` package on the machines that execute the runs.
+
+        >>> exp = Experiment()
+        >>> run = exp.add_run()
+        >>> run.add_command("solver", ["mysolver", "input-file"], compression="xz")
+
         All *kwargs* (except ``stdin``) are passed to `subprocess.Popen
         <http://docs.python.org/library/subprocess.html>`_. Instead of
         file handles you can also pass filenames for the ``stdout`` and
@@ -252,6 +466,9 @@ class _Buildable:
 
         if "stdin" in kwargs:
             logging.critical("redirecting stdin is not supported")
+        compression = kwargs.get("compression")
+        if compression is not None and compression not in tools.PROPERTIES_COMPRESSIONS:
+            logging.critical(f"Unknown compression for {name}: {compression}")
         kwargs["time_limit"] = time_limit
         kwargs["memory_limit"] = memory_limit
         kwargs["soft_stdout_limit"] = soft_stdout_limit
@@ -274,8 +491,10 @@ class _Buildable:
     def _get_rel_path(self, abs_path):
         return os.path.relpath(abs_path, start=self.path)
 
-    def _build_properties_file(self, properties_filename):
-        combined_props = tools.Properties(self._get_abs_path(properties_filename))
+    def _build_properties_file(self, properties_filename, codec):
+        combined_props = tools.Properties(
+            self._get_abs_path(properties_filename), codec=codec
+        )
         combined_props.update(self.properties)
         combined_props.write()
 
@@ -320,7 +539,14 @@ class Experiment(_Buildable):
 
     """
 
-    def __init__(self, path=None, environment=None):
+    def __init__(
+        self,
+        path=None,
+        environment=None,
+        properties_codec="json",
+        parser_host=False,
+        durability="always",
+    ):
         """
         The experiment will be built at *path*. It defaults to
         ``<scriptdir>/data/<scriptname>/``. E.g., for the script
@@ -336,6 +562,47 @@ class Experiment(_Buildable):
         Alternatively, you can derive your own class from
         :ref:`Environment <environments>`.
 
+        *properties_codec* sets the format of the properties files
+        written in run directories and evaluation directories. The
+        default "json" writes pretty-printed JSON files. "compact-json"
+        writes JSON files without indentation, which are smaller and
+        faster to write. "binary" writes files based on Python's
+        :py:mod:`marshal` module, which are much faster to write and
+        read than JSON files, but not human-readable and only readable
+        by the Python version that wrote them. "indexed" writes
+        compact JSON with an index of the runs. Reports and fetchers
+        that filter by algorithm or domain (``filter_algorithm``,
+        ``filter_domain``) only decode the selected runs of indexed
+        evaluation directories. Lab detects the format of existing
+        properties files automatically, so fetchers, parsers and
+        reports work with all formats. ::
+
+            exp = Experiment(properties_codec="binary")
+
+        If *parser_host* is True, all parsers added with
+        :meth:`.add_parser` run in a single Python process per run (see
+        :func:`lab.parser.run_parsers`). The parsers share the run's
+        properties and the contents of parsed files, so the interpreter
+        is started and the ``properties`` file is loaded and written
+        only once per run instead of once per parser. The parsers are
+        executed by a single command called "parsers", which is added
+        at the position of the first parser.
+
+        *durability* controls when the output of the commands is written
+        to disk with ``fsync()``. With the default "always", the output
+        of each command is on disk before the next command starts, so
+        even a crash of the machine can't leave the logs incomplete.
+        "end" writes the logs to disk only once after the last command
+        of the run and "never" leaves it to the operating system. Each
+        ``fsync()`` waits until the storage has written the data, which
+        takes milliseconds on local disks, and often much longer on
+        network file systems like NFS, where it also puts load on the
+        file server if many runs finish at the same time. For experiments
+        with many short runs on network file systems, "end" or "never"
+        can therefore increase the throughput considerably. ::
+
+            exp = Experiment(durability="end")
+
         """
         tools.configure_logging()
 
@@ -346,6 +613,13 @@ class Experiment(_Buildable):
             logging.critical(f"Path contains commas or colons: {self.path}")
         self.environment = environment or environments.LocalEnvironment()
         self.environment.exp = self
+        if properties_codec not in tools.PROPERTIES_CODECS:
+            logging.critical(f"Unknown properties codec: {properties_codec}")
+        self.properties_codec = properties_codec
+        self.parser_host = parser_host
+        if durability not in DURABILITY_MODES:
+            logging.critical(f"Unknown durability mode: {durability}")
+        self.durability = durability
 
         self.steps = []
         self.runs = []
@@ -442,9 +716,18 @@ class Experiment(_Buildable):
         self.resources.append(
             _Resource(name, path_to_parser, dest, symlink=False, is_parser=True)
         )
-        self.add_command(name, [tools.get_python_executable(), f"{{{name}}}"])
+        if not self.parser_host:
+            self.add_command(name, [tools.get_python_executable(), f"{{{name}}}"])
+        elif PARSER_HOST_COMMAND_NAME in self.commands:
+            command, _ = self.commands[PARSER_HOST_COMMAND_NAME]
+            command.append(f"{{{name}}}")
+        else:
+            self.add_command(
+                PARSER_HOST_COMMAND_NAME,
+                [tools.get_python_executable(), "-m", "lab.parser", f"{{{name}}}"],
+            )
 
-    def add_parse_again_step(self):
+    def add_parse_again_step(self, jobs=1, in_process=False, incremental=False):
         """
         Add a step that copies the parsers from their originally specified
         locations to the experiment directory and runs all of them again. This
@@ -452,7 +735,37 @@ class Experiment(_Buildable):
 
         Do not forget to run the default fetch step again to overwrite
         existing data in the -eval dir of the experiment.
+
+        Use *jobs* to parse the run directories with multiple processes.
+        If *jobs* is None, use as many processes as there are CPUs.
+
+        By default, each parser runs in a new Python process for each
+        run (or all parsers run in one process if the experiment uses
+        ``parser_host=True``). If *in_process* is True, the parsers run
+        directly in the (worker) processes of this step instead (see
+        :func:`lab.parser.run_parsers`), which avoids starting a Python
+        interpreter per run.
+
+        If *incremental* is True, only parse runs again whose files or
+        parsers changed since the last incremental parse-again step.
+        For this, the step stores the content hashes of the parser
+        scripts and of the files in each run dir, and the properties
+        that each parser produced, in a ``parse-manifest`` file in the
+        run dir. If only parsers changed, the step reuses the results
+        of the parsers before the first changed parser and runs this
+        parser and all subsequent ones again. Note that only the parser
+        scripts themselves are hashed, not the modules they import. The
+        first incremental parse-again step parses all runs.
+
+        The step logs its progress and throughput. If the parsers
+        profile their timings (see :class:`lab.parser.Parser`), the step
+        also logs a summary of the timings.
+
+        >>> exp = Experiment()
+        >>> exp.add_parse_again_step(jobs=8, in_process=True, incremental=True)
+
         """
+        jobs = tools.get_jobs(jobs)
 
         def run_parsers():
             if not os.path.isdir(self.path):
@@ -464,29 +777,88 @@ class Experiment(_Buildable):
             run_dirs = sorted(glob(os.path.join(self.path, "runs-*-*", "*")))
 
             total_dirs = len(run_dirs)
-            logging.info(f"Parsing properties in {total_dirs:d} run directories")
-            for index, run_dir in enumerate(run_dirs, start=1):
-                if os.path.exists(os.path.join(run_dir, "properties")):
-                    tools.remove_path(os.path.join(run_dir, "properties"))
+            logging.info(
+                f"Parsing properties in {total_dirs:d} run directories "
+                f"with {jobs:d} process(es)"
+            )
+            rel_parsers = [
+                os.path.join("../../", self.env_vars_relative[resource.name])
+                for resource in self.resources
+                if resource.is_parser
+            ]
+            if self.parser_host:
+                parser_commands = [
+                    [tools.get_python_executable(), "-m", "lab.parser"] + rel_parsers
+                ]
+            else:
+                parser_commands = [
+                    [tools.get_python_executable(), rel_parser]
+                    for rel_parser in rel_parsers
+                ]
+            if incremental:
+                parser_hashes = [
+                    _get_file_hash(
+                        os.path.join(self.path, self.env_vars_relative[resource.name])
+                    )
+                    for resource in self.resources
+                    if resource.is_parser
+                ]
+                parse_run_dir = functools.partial(
+                    _parse_run_dir_incrementally,
+                    parsers=rel_parsers,
+                    parser_hashes=parser_hashes,
+                    in_process=in_process,
+                )
+            else:
+                parse_run_dir = functools.partial(
+                    _parse_run_dir,
+                    parser_commands=parser_commands,
+                    parsers=rel_parsers,
+                    in_process=in_process,
+                )
+            start_time = time.time()
+            parsed_runs = 0
+            profiled = bool(os.environ.get(parser.PROFILE_ENVIRONMENT_VARIABLE))
+            results = tools.map_jobs(parse_run_dir, run_dirs, jobs, ordered=False)
+            for index, (error, parsed, has_profile) in enumerate(results, start=1):
+                if error:
+                    logging.critical(error)
+                parsed_runs += parsed
+                profiled |= has_profile
                 loglevel = logging.INFO if index % 100 == 0 else logging.DEBUG
-                logging.log(loglevel, f"Parsing run: {index:6d}/{total_dirs:d}")
-                for resource in self.resources:
-                    if resource.is_parser:
-                        parser_filename = self.env_vars_relative[resource.name]
-                        rel_parser = os.path.join("../../", parser_filename)
-                        # Since parsers often produce output which we would
-                        # rather not want to see for each individual run, we
-                        # suppress it here.
-                        subprocess.check_call(
-                            [tools.get_python_executable(), rel_parser],
-                            cwd=run_dir,
-                            stdout=subprocess.DEVNULL,
-                        )
+                elapsed = time.time() - start_time
+                logging.log(
+                    loglevel,
+                    f"Parsed runs: {index:6d}/{total_dirs:d} "
+                    f"({index / max(elapsed, 1e-6):.1f} runs/s)",
+                )
+            elapsed = time.time() - start_time
+            logging.info(
+                f"Parsed {total_dirs:d} run directories in {elapsed:.1f}s "
+                f"({total_dirs / max(elapsed, 1e-6):.1f} runs/s)"
+            )
+            if incremental:
+                logging.info(
+                    f"Ran parsers in {parsed_runs:d} run directories and skipped "
+                    f"{total_dirs - parsed_runs:d} unchanged ones"
+                )
+            if profiled:
+                parser.summarize_profiles(self.path)
 
         self.add_step("parse-again", run_parsers)
 
     def add_fetcher(
-        self, src=None, dest=None, merge=None, name=None, filter=None, **kwargs
+        self,
+        src=None,
+        dest=None,
+        merge=None,
+        name=None,
+        filter=None,
+        jobs=1,
+        incremental=False,
+        watch=False,
+        compression=None,
+        **kwargs,
     ):
         """
         Add a step that fetches results from experiment or evaluation
@@ -496,7 +868,9 @@ class Experiment(_Buildable):
         experiments.
 
         *src* can be an experiment or evaluation directory. It defaults
-        to ``exp.path``.
+        to ``exp.path``. It can also be a tar archive of an experiment
+        directory (``.tar``, ``.tar.gz``, ``.tar.xz``, etc.). The needed
+        files are read from the archive without unpacking it.
 
         *dest* must be a new or existing evaluation directory. It
         defaults to ``exp.eval_dir``. If *dest* already contains
@@ -512,6 +886,34 @@ class Experiment(_Buildable):
         domains or algorithms) by passing :py:class:`filters <.Report>`
         with the *filter* argument.
 
+        Scanning the run directories of large experiments can take a
+        long time, especially on network file systems. Use *jobs* to
+        scan the run directories with multiple processes. If *jobs* is
+        None, use one process per CPU. The resulting properties file is
+        the same for all values of *jobs*.
+
+        If *incremental* is True, the fetcher stores the sizes and
+        modification times of the fetched run files in the evaluation
+        directory. When fetching from the same experiment again, only
+        the run directories with changed files are scanned again. This
+        makes it cheap to fetch the results of a running experiment
+        repeatedly. Incremental fetching needs the existing data, so
+        you'll usually want to combine it with ``merge=True``. It can't
+        be combined with filters.
+
+        If *watch* is True, the step doesn't fetch the results once,
+        but keeps fetching the results of finished runs while the
+        experiment is running (see ``Fetcher.watch()``). Run this
+        step locally in a separate shell after starting the experiment.
+        Watching can't be combined with filters.
+
+        Set *compression* to "gz", "xz" or "zst" to write a compressed
+        properties file (e.g., ``properties.xz``) to the evaluation
+        directory. By default, the fetcher keeps the format of an
+        existing properties file. All Lab steps find compressed
+        properties files automatically. Writing and reading ".zst"
+        files requires the ``zstandard`` package.
+
         Example setup:
 
         >>> exp = Experiment("/tmp/exp")
@@ -531,11 +933,45 @@ class Experiment(_Buildable):
 
         >>> exp.add_fetcher(filter_algorithm=["algo_1", "algo_5"])
 
+        Scan the run directories with 8 processes:
+
+        >>> exp.add_fetcher(name="fetch-parallel", jobs=8)
+
+        Only scan run directories that changed since the last fetch:
+
+        >>> exp.add_fetcher(name="fetch-incremental", merge=True, incremental=True)
+
+        Fetch results while the experiment is running:
+
+        >>> exp.add_fetcher(name="fetch-watch", merge=True, watch=True)
+
+        Write an xz-compressed properties file:
+
+        >>> exp.add_fetcher(name="fetch-xz", compression="xz")
+
         """
         src = src or self.path
         dest = dest or self.eval_dir
         name = name or f"fetch-{os.path.basename(src.rstrip('/'))}"
-        self.add_step(name, Fetcher(), src, dest, merge=merge, filter=filter, **kwargs)
+        if watch:
+            if filter or kwargs:
+                logging.critical("Watching cannot be combined with filters.")
+            self.add_step(
+                name, Fetcher().watch, src, dest, merge=merge, compression=compression
+            )
+            return
+        self.add_step(
+            name,
+            Fetcher(),
+            src,
+            dest,
+            merge=merge,
+            filter=filter,
+            jobs=jobs,
+            incremental=incremental,
+            compression=compression,
+            **kwargs,
+        )
 
     def add_report(self, report, name="", eval_dir="", outfile=""):
         """Add *report* to the list of experiment steps.
@@ -619,7 +1055,9 @@ class Experiment(_Buildable):
         self._build_new_files()
         self._build_resources()
         self._build_runs()
-        self._build_properties_file(STATIC_EXPERIMENT_PROPERTIES_FILENAME)
+        self._build_properties_file(
+            STATIC_EXPERIMENT_PROPERTIES_FILENAME, self.properties_codec
+        )
 
     def start_runs(self):
         """Execute all runs that were added to the experiment.
@@ -681,7 +1119,9 @@ class Run(_Buildable):
         self._build_new_files()
         self._build_resources()
         self._check_id()
-        self._build_properties_file(STATIC_RUN_PROPERTIES_FILENAME)
+        self._build_properties_file(
+            STATIC_RUN_PROPERTIES_FILENAME, self.experiment.properties_codec
+        )
 
     def _build_run_script(self):
         if not self.commands:
@@ -733,7 +1173,9 @@ class Run(_Buildable):
             make_call(name, cmd, kwargs)
             for name, (cmd, kwargs) in self.commands.items()
         )
-        run_script = tools.fill_template("run.py", calls=calls_text)
+        run_script = tools.fill_template(
+            "run.py", calls=calls_text, durability=self.experiment.durability
+        )
 
         self.add_new_file("", "run", run_script, permissions=0o755)
 
@@ -1,12 +1,35 @@
 from glob import glob
 import logging
 import os
+import re
 import sys
+import tarfile
+import time
 
-from lab import tools
+from lab import columnar, tools
+from lab.calls import call
 import lab.experiment
 
 
+# Sizes and modification times of the fetched run files in an eval dir.
+FETCH_MANIFEST_FILENAME = "fetch-manifest"
+
+ARCHIVE_SUFFIXES = [".tar", ".tar.gz", ".tgz", ".tar.xz", ".txz", ".tar.bz2"]
+
+# Logs whose content is an unexplained error. Commands with compressed
+# output write their errors to run.err.gz, run.err.xz or run.err.zst.
+ERROR_LOGS = ["driver.err", "run.err"] + [
+    f"run.err.{compression}" for compression in tools.PROPERTIES_COMPRESSIONS
+]
+
+
+def _get_archive_suffix(path):
+    for suffix in ARCHIVE_SUFFIXES:
+        if path.endswith(suffix):
+            return suffix
+    return None
+
+
 def _check_eval_dir(eval_dir):
     if os.path.exists(eval_dir):
         answer = (
@@ -28,6 +51,65 @@ def _check_eval_dir(eval_dir):
             logging.critical(f'Invalid answer: "{answer}"')
 
 
+def _prepare_eval_dir(eval_dir, merge):
+    if merge is None:
+        _check_eval_dir(eval_dir)
+    elif merge:
+        # No action needed, data will be merged.
+        pass
+    else:
+        tools.remove_path(eval_dir)
+
+
+def _read_slurm_err_content(src_dir):
+    try:
+        return tools.get_slurm_err_content(src_dir)
+    except FileNotFoundError:
+        return ""
+
+
+def _get_run_dir_signature(run_dir):
+    """
+    Return the sizes and modification times of all files in *run_dir*
+    that influence the fetched properties.
+    """
+    signature = []
+    for filename in [
+        lab.experiment.STATIC_RUN_PROPERTIES_FILENAME,
+        call.PROPERTIES_FILENAME,
+        "properties",
+        "driver.log",
+    ] + ERROR_LOGS:
+        try:
+            stat = os.stat(os.path.join(run_dir, filename))
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append([stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def _load_fetched_runs(eval_dir, src_dir, slurm_err):
+    """
+    Return a dictionary that maps the run dirs of *src_dir* that have
+    been fetched to *eval_dir* before to their run IDs and signatures.
+    """
+    manifest = tools.Properties(os.path.join(eval_dir, FETCH_MANIFEST_FILENAME))
+    src_manifest = manifest.get(os.path.abspath(src_dir), {})
+    # Fetch all runs again if the content of slurm.err changed.
+    if src_manifest.get("slurm_err") != slurm_err:
+        return {}
+    return src_manifest.get("runs", {})
+
+
+def _write_fetched_runs(eval_dir, src_dir, slurm_err, fetched_runs):
+    manifest = tools.Properties(
+        os.path.join(eval_dir, FETCH_MANIFEST_FILENAME), codec="compact-json"
+    )
+    manifest[os.path.abspath(src_dir)] = {"slurm_err": slurm_err, "runs": fetched_runs}
+    manifest.write()
+
+
 class Fetcher:
     """
     Collect data from the runs of an experiment and store it in an
@@ -44,36 +126,102 @@ class Fetcher:
     """
 
     def fetch_dir(self, run_dir):
-        static_props = tools.Properties(
-            filename=os.path.join(
-                run_dir, lab.experiment.STATIC_RUN_PROPERTIES_FILENAME
-            )
-        )
-        dynamic_props = tools.Properties(filename=os.path.join(run_dir, "properties"))
+        def read_file(filename):
+            path = os.path.join(run_dir, filename)
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+
+        def exists(filename):
+            return os.path.exists(os.path.join(run_dir, filename))
 
+        return self._fetch_run(read_file, exists, run_dir)
+
+    def _fetch_run(self, read_file, exists, run_dir):
+        """
+        Return the properties of the run in *run_dir*. *read_file* must
+        return the content of the given file from the run dir as bytes or
+        None if the file doesn't exist. *exists* must return whether the
+        given file exists in the run dir.
+        """
         props = tools.Properties()
-        props.update(static_props)
-        props.update(dynamic_props)
+        # Properties written by parsers take precedence.
+        for filename in [
+            lab.experiment.STATIC_RUN_PROPERTIES_FILENAME,
+            call.PROPERTIES_FILENAME,
+            "properties",
+        ]:
+            content = read_file(filename)
+            if content is not None:
+                props.loads(content, os.path.join(run_dir, filename))
 
-        driver_log = os.path.join(run_dir, "driver.log")
-        if not os.path.exists(driver_log):
+        if not exists("driver.log"):
             props.add_unexplained_error(
                 "driver.log is missing. Probably the run was never started."
             )
 
-        driver_err = os.path.join(run_dir, "driver.err")
-        run_err = os.path.join(run_dir, "run.err")
-        for logfile in [driver_err, run_err]:
-            if os.path.exists(logfile):
-                with open(logfile) as f:
-                    content = f.read()
-                if content:
-                    props.add_unexplained_error(
-                        f"{os.path.basename(logfile)}: {content}"
-                    )
+        for logfile in ERROR_LOGS:
+            content = read_file(logfile)
+            complete = True
+            if content and tools.is_compressed(logfile):
+                content, complete = tools.decompress_data(content, logfile)
+            if content:
+                props.add_unexplained_error(f"{logfile}: {tools.get_string(content)}")
+            if not complete:
+                props.add_unexplained_error(
+                    f"{logfile} ends unexpectedly. Probably the run was killed "
+                    f"while writing it."
+                )
         return props
 
-    def __call__(self, src_dir, eval_dir=None, merge=None, filter=None, **kwargs):
+    def _fetch_archive(self, archive):
+        """
+        Return the properties of all runs in the tar file *archive*.
+
+        The archive is read as a stream and only the files needed for
+        the properties are kept in memory. Nothing is written to disk.
+        """
+        run_file_regex = re.compile(r"(?:^|/)(runs-\d+-\d+/\d+)/([^/]+)$")
+        wanted_files = [
+            lab.experiment.STATIC_RUN_PROPERTIES_FILENAME,
+            call.PROPERTIES_FILENAME,
+            "properties",
+        ] + ERROR_LOGS
+        run_files = {}
+        with tarfile.open(archive, mode="r|*") as tar:
+            for member in tar:
+                match = run_file_regex.search(member.name)
+                if not match:
+                    continue
+                rel_run_dir, filename = match.groups()
+                files = run_files.setdefault(rel_run_dir, {})
+                if filename == "driver.log":
+                    # We only need to know whether driver.log exists.
+                    files[filename] = b""
+                elif filename in wanted_files and member.isfile():
+                    files[filename] = tar.extractfile(member).read()
+
+        return [
+            self._fetch_run(
+                run_files[rel_run_dir].get,
+                run_files[rel_run_dir].__contains__,
+                os.path.join(archive, rel_run_dir),
+            )
+            for rel_run_dir in sorted(run_files)
+        ]
+
+    def __call__(
+        self,
+        src_dir,
+        eval_dir=None,
+        merge=None,
+        filter=None,
+        jobs=1,
+        incremental=False,
+        compression=None,
+        **kwargs,
+    ):
         """
         This method can be used to copy properties from an exp-dir or
         eval-dir into an eval-dir. If the destination eval-dir already
@@ -86,54 +234,105 @@ class Fetcher:
         description of the parameters.
 
         """
-        if not os.path.isdir(src_dir):
+        jobs = tools.get_jobs(jobs)
+        archive_suffix = _get_archive_suffix(src_dir)
+        if archive_suffix and os.path.isfile(src_dir):
+            if incremental:
+                logging.critical("Archives cannot be fetched incrementally.")
+            # Treat "path/to/exp.tar.gz" like "path/to/exp".
+            exp_dir = src_dir[: -len(archive_suffix)]
+        elif os.path.isdir(src_dir):
+            archive_suffix = None
+            exp_dir = src_dir
+        else:
             logging.critical(f"{src_dir} is missing or not a directory")
         run_filter = tools.RunFilter(filter, **kwargs)
+        if incremental and run_filter.filters:
+            logging.critical("Incremental fetching cannot be combined with filters.")
 
-        eval_dir = eval_dir or src_dir.rstrip("/") + "-eval"
+        eval_dir = eval_dir or exp_dir.rstrip("/") + "-eval"
         logging.info(f"Fetching properties from {src_dir} to {eval_dir}")
 
-        if merge is None:
-            _check_eval_dir(eval_dir)
-        elif merge:
-            # No action needed, data will be merged.
-            pass
-        else:
-            tools.remove_path(eval_dir)
+        _prepare_eval_dir(eval_dir, merge)
 
         # Load properties in the eval_dir if there are any already.
-        combined_props = tools.Properties(os.path.join(eval_dir, "properties"))
-        fetch_from_eval_dir = not os.path.exists(
+        combined_props = tools.Properties(
+            os.path.join(eval_dir, "properties"), compression=compression
+        )
+        fetch_from_eval_dir = not archive_suffix and not os.path.exists(
             os.path.join(src_dir, "runs-00001-00100")
         )
         if fetch_from_eval_dir:
-            src_props = tools.Properties(filename=os.path.join(src_dir, "properties"))
-            run_filter.apply(src_props)
+            src_file = tools.find_properties_file(os.path.join(src_dir, "properties"))
+            src_props = run_filter.load_selected(src_file)
+            if src_props is None:
+                src_props = tools.Properties(filename=src_file)
+            if src_props:
+                run_filter.apply(src_props)
             combined_props.update(src_props)
+            combined_props.codec = combined_props.codec or src_props.codec
+            combined_props.compression = (
+                combined_props.compression or src_props.compression
+            )
             logging.info(f"Fetched properties of {len(src_props)} runs.")
         else:
-            try:
-                slurm_err_content = tools.get_slurm_err_content(src_dir)
-            except FileNotFoundError:
-                slurm_err_content = ""
-
+            slurm_err_content = _read_slurm_err_content(exp_dir)
             if slurm_err_content:
                 logging.error("There was output to *-grid-steps/slurm.err")
 
             new_props = tools.Properties()
-            run_dirs = sorted(glob(os.path.join(src_dir, "runs-*-*", "*")))
-            total_dirs = len(run_dirs)
-            logging.info(f"Scanning properties from {total_dirs:d} run directories")
-            for index, run_dir in enumerate(run_dirs, start=1):
+            if archive_suffix:
+                # Archives are read sequentially, so we ignore "jobs" here.
+                logging.info(f"Reading run directories from archive {src_dir}")
+                run_props = self._fetch_archive(src_dir)
+                total_dirs = len(run_props)
+                if not run_props:
+                    logging.critical(f"No run directories found in {src_dir}")
+            else:
+                run_dirs = sorted(glob(os.path.join(src_dir, "runs-*-*", "*")))
+                if incremental:
+                    old_runs = _load_fetched_runs(
+                        eval_dir, src_dir, bool(slurm_err_content)
+                    )
+                    new_runs = {}
+                    changed_run_dirs = []
+                    for run_dir in run_dirs:
+                        rel_run_dir = os.path.relpath(run_dir, src_dir)
+                        signature = _get_run_dir_signature(run_dir)
+                        id_string, old_signature = old_runs.get(
+                            rel_run_dir, (None, None)
+                        )
+                        if signature == old_signature and id_string in combined_props:
+                            new_runs[rel_run_dir] = (id_string, signature)
+                        else:
+                            changed_run_dirs.append((run_dir, signature))
+                    logging.info(
+                        f"{len(changed_run_dirs):d} of {len(run_dirs):d} run "
+                        f"directories changed since the last fetch"
+                    )
+                    run_dirs = [run_dir for run_dir, _ in changed_run_dirs]
+                total_dirs = len(run_dirs)
+                logging.info(
+                    f"Scanning properties from {total_dirs:d} run directories "
+                    f"with {jobs:d} process(es)"
+                )
+                run_props = tools.map_jobs(self.fetch_dir, run_dirs, jobs)
+            for index, props in enumerate(run_props, start=1):
                 loglevel = logging.INFO if index % 100 == 0 else logging.DEBUG
                 logging.log(loglevel, f"Scanning: {index:6d}/{total_dirs:d}")
-                props = self.fetch_dir(run_dir)
                 if slurm_err_content:
                     props.add_unexplained_error("output-to-slurm.err")
                 id_string = "-".join(props["id"])
                 new_props[id_string] = props
+                if incremental:
+                    run_dir, signature = changed_run_dirs[index - 1]
+                    rel_run_dir = os.path.relpath(run_dir, src_dir)
+                    new_runs[rel_run_dir] = (id_string, signature)
             run_filter.apply(new_props)
             combined_props.update(new_props)
+            if combined_props.codec is None and new_props:
+                # Use the codec of the run properties for new eval dirs.
+                combined_props.codec = next(iter(new_props.values())).codec
 
         unexplained_errors = 0
         for props in combined_props.values():
@@ -144,7 +343,124 @@ class Fetcher:
 
         tools.makedirs(eval_dir)
         combined_props.write()
+        columnar.write_columns(combined_props)
         logging.info(
             f"Wrote properties file (contains {unexplained_errors} "
             f"runs with unexplained errors)."
         )
+        if incremental and not fetch_from_eval_dir:
+            # Only write the manifest after the properties, since the
+            # manifest claims that the properties are up to date.
+            _write_fetched_runs(eval_dir, src_dir, bool(slurm_err_content), new_runs)
+
+    def watch(
+        self,
+        src_dir,
+        eval_dir=None,
+        merge=None,
+        interval=60,
+        compression=None,
+    ):
+        """
+        Fetch the results of finished runs while the experiment is
+        running.
+
+        Every *interval* seconds, scan *src_dir* for runs that finished
+        since the last scan, i.e., for runs with ``driver.log`` and
+        ``properties`` files, and add their properties to *eval_dir*.
+        Runs whose files change after they have been fetched are fetched
+        again. The properties file and its columnar sidecar file are
+        replaced atomically after each scan, so reports can be made from
+        *eval_dir* at any time. During long scans, e.g., the first scan
+        of a large experiment, the fetched results are also written
+        every *interval* seconds, but at most 1/5 of the time is spent
+        writing them.
+
+        Watching stops when all runs have finished or when it is
+        interrupted with Ctrl+C. See
+        :py:meth:`add_fetcher() <lab.experiment.Experiment.add_fetcher>`
+        for a description of *eval_dir*, *merge* and *compression*.
+
+        """
+        if not os.path.isdir(src_dir):
+            logging.critical(f"{src_dir} is missing or not a directory")
+        eval_dir = eval_dir or src_dir.rstrip("/") + "-eval"
+        logging.info(f"Watching {src_dir} and fetching finished runs to {eval_dir}")
+        _prepare_eval_dir(eval_dir, merge)
+
+        combined_props = tools.Properties(
+            os.path.join(eval_dir, "properties"), compression=compression
+        )
+        slurm_err = False
+        fetched_runs = None
+        next_write_time = time.time() + interval
+
+        def write_results(num_runs, finished_runs, total_runs):
+            nonlocal next_write_time
+            start_time = time.time()
+            combined_props.write()
+            columnar.write_columns(combined_props)
+            _write_fetched_runs(eval_dir, src_dir, slurm_err, fetched_runs)
+            # Rewriting large files takes long, so limit the time spent on it.
+            now = time.time()
+            next_write_time = now + max(interval, 5 * (now - start_time))
+            logging.info(
+                f"Fetched {num_runs:d} runs ({finished_runs:d}/"
+                f"{total_runs:d} runs finished)"
+            )
+
+        try:
+            while True:
+                new_slurm_err = bool(_read_slurm_err_content(src_dir))
+                if new_slurm_err and not slurm_err:
+                    logging.error("There was output to *-grid-steps/slurm.err")
+                if fetched_runs is None:
+                    fetched_runs = _load_fetched_runs(eval_dir, src_dir, new_slurm_err)
+                elif new_slurm_err != slurm_err:
+                    # Fetch all runs again to mark them with the slurm.err error.
+                    fetched_runs = {}
+                slurm_err = new_slurm_err
+
+                run_dirs = sorted(glob(os.path.join(src_dir, "runs-*-*", "*")))
+                finished_runs = 0
+                pending_run_dirs = []
+                for run_dir in run_dirs:
+                    if not all(
+                        os.path.exists(os.path.join(run_dir, filename))
+                        for filename in ["driver.log", "properties"]
+                    ):
+                        continue
+                    finished_runs += 1
+                    rel_run_dir = os.path.relpath(run_dir, src_dir)
+                    signature = _get_run_dir_signature(run_dir)
+                    id_string, old_signature = fetched_runs.get(
+                        rel_run_dir, (None, None)
+                    )
+                    if signature != old_signature or id_string not in combined_props:
+                        pending_run_dirs.append((rel_run_dir, signature))
+
+                unwritten_runs = 0
+                for rel_run_dir, signature in pending_run_dirs:
+                    props = self.fetch_dir(os.path.join(src_dir, rel_run_dir))
+                    if slurm_err:
+                        props.add_unexplained_error("output-to-slurm.err")
+                    error_message = tools.get_unexplained_errors_message(props)
+                    if error_message:
+                        logging.error(error_message)
+                    id_string = "-".join(props["id"])
+                    combined_props[id_string] = props
+                    combined_props.codec = combined_props.codec or props.codec
+                    fetched_runs[rel_run_dir] = (id_string, signature)
+                    unwritten_runs += 1
+                    if time.time() >= next_write_time:
+                        write_results(unwritten_runs, finished_runs, len(run_dirs))
+                        unwritten_runs = 0
+                if unwritten_runs:
+                    write_results(unwritten_runs, finished_runs, len(run_dirs))
+
+                if run_dirs and finished_runs == len(run_dirs):
+                    logging.info("All runs finished.")
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching the experiment.")
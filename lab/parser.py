@@ -22,6 +22,11 @@ You can add this parser to all runs by using :meth:`add_parser()
 All added parsers will be run in the order in which they were added after
 executing the run's commands.
 
+By default, each parser runs in a separate Python process, which loads
+and writes the ``properties`` file. If the experiment is created with
+``parser_host=True``, all parsers of a run are executed in a single
+process instead (see :func:`run_parsers`).
+
 If you need to change your parsers and execute them again, use the
 :meth:`~lab.experiment.Experiment.add_parse_again_step` method to re-parse
 your results.
@@ -30,13 +35,219 @@ your results.
 
 from collections import defaultdict
 import errno
+import functools
+from glob import glob
+import io
 import logging
+import mmap
 import os.path
 import re
+import runpy
+import sys
+import time
 
 from lab import tools
 
 
+# Name of the file in which parsers store their timings if profiling is on.
+PROFILE_FILENAME = "parser-profile"
+PROFILE_ENVIRONMENT_VARIABLE = "LAB_PARSER_PROFILE"
+
+# Shared state of all parsers if they run in a common process.
+_host = None
+
+
+class _ParserHost:
+    def __init__(self, run_dir):
+        self.props = _load_run_properties(run_dir)
+        self.file_contents = {}
+
+    def read_file(self, filenames):
+        key = tuple(filenames)
+        if key not in self.file_contents:
+            self.file_contents[key] = _read_file(filenames)
+        return self.file_contents[key]
+
+
+def _read_file(filenames):
+    """
+    Return the text of the files and whether they are complete. For
+    compressed files that end unexpectedly, use the readable part.
+    """
+    parts = []
+    complete = True
+    for filename in filenames:
+        if tools.is_compressed(filename):
+            data, file_complete = tools.read_compressed_file(filename)
+            complete = complete and file_complete
+            # Decode like open() to get the same universal newlines.
+            parts.append(io.TextIOWrapper(io.BytesIO(data), errors="replace").read())
+        else:
+            with open(filename) as f:
+                parts.append(f.read())
+    return "".join(parts), complete
+
+
+def _map_file(filenames):
+    """Return the content of the files as bytes and whether it is complete."""
+    if len(filenames) > 1 or tools.is_compressed(filenames[0]):
+        # Compressed files can't be mapped, so we decompress them instead.
+        parts = []
+        complete = True
+        for filename in filenames:
+            if tools.is_compressed(filename):
+                data, file_complete = tools.read_compressed_file(filename)
+                complete = complete and file_complete
+            else:
+                with open(filename, "rb") as f:
+                    data = f.read()
+            parts.append(data)
+        return b"".join(parts), complete
+    with open(filenames[0], "rb") as f:
+        # Empty files can't be mapped.
+        if os.fstat(f.fileno()).st_size == 0:
+            return b"", True
+        # The mapping stays valid after closing the file.
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), True
+
+
+def _iterate_lines(filenames):
+    for filename in filenames:
+        with tools.open_file(filename) as f:
+            if not tools.is_compressed(filename):
+                yield from f
+                continue
+            try:
+                yield from f
+            except tools.get_decompression_errors(filename):
+                # Parser.parse() reports incomplete files.
+                return
+
+
+def _load_run_properties(run_dir):
+    props = tools.Properties(filename=os.path.join(run_dir, "properties"))
+    if props.codec is None:
+        # Use the format of the static properties for new files.
+        props.codec = tools.get_properties_codec(
+            os.path.join(run_dir, "static-properties")
+        )
+    return props
+
+
+def _has_top_level_alternation(regex):
+    depth = 0
+    chars = iter(regex)
+    for char in chars:
+        if char == "\\":
+            next(chars, None)
+        elif char == "[":
+            # Skip the character class. "]" is a literal if it comes first.
+            char = next(chars, None)
+            if char == "^":
+                char = next(chars, None)
+            if char == "]":
+                char = next(chars, None)
+            while char is not None and char != "]":
+                if char == "\\":
+                    next(chars, None)
+                char = next(chars, None)
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+class _Regex:
+    """
+    Compiled regex with fast searching for regexes like "^..." that use
+    the re.M flag.
+
+    For these regexes, Python tries to match at every position in the
+    content, which is slow for large logs. Instead, we look for a newline
+    followed by the rest of the regex, which Python finds with a fast
+    literal search. Since the regex can only match at the start of the
+    content or after a newline, the matched groups stay the same.
+    """
+
+    def __init__(self, regex, flags, binary=False):
+        def compile_regex(regex):
+            if binary:
+                # Byte regexes don't support (and don't need) the re.U flag.
+                return re.compile(tools.get_bytes(regex), flags & ~re.U)
+            return re.compile(regex, flags)
+
+        self.regex = compile_regex(regex)
+        self.line_regex = None
+        # We can't rewrite the regex if "^" only belongs to one alternative
+        # or if a verbose regex ends with a comment.
+        if (
+            flags & re.M
+            and not flags & re.X
+            and regex.startswith("^")
+            and not _has_top_level_alternation(regex)
+        ):
+            self.line_regex = compile_regex(rf"\n(?:{regex[1:]})")
+
+    def search(self, content, pos=0):
+        """
+        Return the first match at or after *pos*, or None. For rewritten
+        regexes, the match also contains the preceding newline, so only
+        use :py:meth:`get_start` and the groups of the match.
+        """
+        if self.line_regex is None:
+            return self.regex.search(content, pos)
+        # "^" only matches at pos if pos is the start of a line.
+        return self.regex.match(content, pos) or self.line_regex.search(content, pos)
+
+    def get_start(self, match):
+        return match.start() + int(match.re is self.line_regex)
+
+    def findall(self, content):
+        if self.line_regex is None:
+            return self.regex.findall(content)
+        matches = []
+        pos = 0
+        while pos <= len(content):
+            match = self.search(content, pos)
+            if not match:
+                break
+            start = self.get_start(match)
+            if match.end() == start:
+                # Let Python handle the intricate rules for empty matches.
+                return self.regex.findall(content)
+            if self.regex.groups == 0:
+                matches.append(content[start : match.end()])
+            elif self.regex.groups == 1:
+                matches.append(match.group(1) or content[:0])
+            else:
+                matches.append(match.groups(default=content[:0]))
+            pos = match.end()
+        return matches
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(regex, flags, binary=False):
+    return _Regex(regex, flags, binary=binary)
+
+
+def findall(regex, content, flags=0):
+    r"""
+    Return the same list as ``re.findall(regex, content, flags)``.
+
+    This function is much faster than :py:func:`re.findall` for large
+    files if *regex* starts with "^" and *flags* contains ``re.M``,
+    i.e., if the regex matches at the start of lines:
+
+    >>> findall(r"^(\w+) time: (.+)s$", "Search time: 3s\nTotal time: 4s", re.M)
+    [('Search', '3'), ('Total', '4')]
+
+    """
+    return _compile(regex, flags).findall(content)
+
+
 def _get_pattern_flags(s):
     flags = 0
     for char in s:
@@ -54,12 +265,17 @@ class _Pattern:
         self.required = required
         self.group = 1
 
-        flags = _get_pattern_flags(flags)
-        self.regex = re.compile(regex, flags)
+        self.flags = _get_pattern_flags(flags)
+        self.regex = _compile(regex, self.flags)
 
     def search(self, content, filename):
         found_props = {}
-        match = self.regex.search(content)
+        if isinstance(content, str):
+            regex = self.regex
+        else:
+            # Search memory-mapped files with the equivalent byte regex.
+            regex = _compile(str(self), self.flags, binary=True)
+        match = regex.search(content)
         if match:
             try:
                 value = match.group(self.group)
@@ -69,6 +285,8 @@ class _Pattern:
                     f"file {filename}."
                 )
             else:
+                if isinstance(value, bytes):
+                    value = tools.get_string(value)
                 value = self.type_(value)
                 found_props[self.attribute] = value
         elif self.required:
@@ -76,7 +294,7 @@ class _Pattern:
         return found_props
 
     def __str__(self):
-        return self.regex.pattern
+        return self.regex.regex.pattern
 
 
 class _FileParser:
@@ -87,42 +305,114 @@ class _FileParser:
 
     def __init__(self):
         self.filename = None
+        self.filenames = None
         self.content = None
+        self.complete = True
         self.patterns = []
         self.functions = []
 
-    def load_file(self, filename):
+    def load_file(self, filename, streaming=False):
+        # Also read compressed variants of the file, e.g., run.log.gz.
         self.filename = filename
-        with open(filename) as f:
-            self.content = f.read()
+        self.filenames = tools.find_log_files(filename)
+        if streaming:
+            self.content, self.complete = _map_file(self.filenames)
+        elif _host is None:
+            self.content, self.complete = _read_file(self.filenames)
+        else:
+            self.content, self.complete = _host.read_file(self.filenames)
+
+    def close(self):
+        if isinstance(self.content, mmap.mmap):
+            self.content.close()
+        self.content = None
 
     def add_pattern(self, pattern):
         self.patterns.append(pattern)
 
-    def add_function(self, function):
-        self.functions.append(function)
+    def add_function(self, function, lines=False):
+        self.functions.append((function, lines))
+
+    def _get_text(self):
+        if isinstance(self.content, str):
+            return self.content
+        elif _host is None:
+            return _read_file(self.filenames)[0]
+        else:
+            return _host.read_file(self.filenames)[0]
 
-    def search_patterns(self):
+    def search_patterns(self, timings=None):
         assert self.content is not None
         found_props = {}
         for pattern in self.patterns:
+            start_time = time.perf_counter()
             found_props.update(pattern.search(self.content, self.filename))
+            if timings is not None:
+                timings[f"pattern {pattern.attribute}"] = (
+                    time.perf_counter() - start_time
+                )
         return found_props
 
-    def apply_functions(self, props):
+    def apply_functions(self, props, timings=None):
         assert self.content is not None
-        for function in self.functions:
-            function(self.content, props)
+        # Decode the file at most once, even if several functions need it.
+        text = None
+        for function, lines in self.functions:
+            start_time = time.perf_counter()
+            if lines and (
+                len(self.filenames) > 1 or tools.is_compressed(self.filenames[0])
+            ):
+                function(_iterate_lines(self.filenames), props)
+            elif lines:
+                with tools.open_file(self.filenames[0]) as f:
+                    function(f, props)
+            else:
+                if text is None:
+                    text = self._get_text()
+                function(text, props)
+            if timings is not None:
+                name = getattr(function, "__qualname__", repr(function))
+                timings[f"function {name}"] = time.perf_counter() - start_time
 
 
 class Parser:
-    """
+    r"""
     Parse files in the current directory and write results into the
     run's ``properties`` file.
+
+    By default, the parser reads each file into memory. If *streaming*
+    is True, patterns are matched over a memory map of the file instead
+    and functions added with ``lines=True`` iterate over the lines of the
+    file, so the memory usage of the parser doesn't grow with the size
+    of the parsed files. Use this mode for very large logs. Functions
+    without ``lines=True`` still receive the whole file content. In
+    streaming mode, patterns are matched against the raw bytes of the
+    file, so ``\d``, ``\w`` and ``\s`` only match ASCII characters.
+
+    If a file doesn't exist, the parser reads its compressed variant
+    instead, i.e., ``run.log.gz``, ``run.log.xz`` or ``run.log.zst``
+    for ``run.log``. If only some commands of the run compress their
+    output (see the *compression* argument of
+    :meth:`~lab.experiment._Buildable.add_command`), the parser reads
+    the compressed output of these commands followed by the uncompressed
+    output of the other commands (see :func:`lab.tools.find_log_files`).
+    Reading ".zst" files requires the ``zstandard`` package.
+
+    >>> parser = Parser(streaming=True)
+
+    If *profile* is True or the environment variable
+    ``LAB_PARSER_PROFILE`` is set to a non-empty value, the parser
+    measures the time for reading each file, searching each pattern and
+    applying each function, and stores the timings in the
+    ``parser-profile`` file in the run dir. The parse-again step sums
+    up the timings of all runs (see :func:`summarize_profiles`).
+
     """
 
-    def __init__(self):
+    def __init__(self, streaming=False, profile=False):
         tools.configure_logging()
+        self.streaming = streaming
+        self.profile = profile or bool(os.environ.get(PROFILE_ENVIRONMENT_VARIABLE))
         self.file_parsers = defaultdict(_FileParser)
 
     def add_pattern(
@@ -159,7 +449,7 @@ class Parser:
             _Pattern(attribute, regex, required, type, flags)
         )
 
-    def add_function(self, function, file="run.log"):
+    def add_function(self, function, file="run.log", lines=False):
         r"""Call ``function(open(file).read(), properties)`` during parsing.
 
         Functions are applied **after** all patterns have been
@@ -184,35 +474,175 @@ class Parser:
         parsing function detects that something went wrong during the
         run.
 
+        If *lines* is True, the function is passed an iterator over the
+        lines of the file instead of the file contents. This avoids
+        loading large files into memory, especially in combination with
+        ``Parser(streaming=True)``:
+
+        >>> def count_lines(lines, props):
+        ...     props["lines"] = sum(1 for line in lines)
+        ...
+        >>> parser.add_function(count_lines, lines=True)
+
         """
-        self.file_parsers[file].add_function(function)
+        self.file_parsers[file].add_function(function, lines=lines)
 
     def parse(self):
         """Search all patterns and apply all functions.
 
         The found values are written to the run's ``properties`` file.
+        If the parser runs in a parser host (see :func:`run_parsers`),
+        the values are added to the shared properties instead, which the
+        host writes after all parsers have finished.
 
         """
         run_dir = os.path.abspath(".")
-        prop_file = os.path.join(run_dir, "properties")
-        self.props = tools.Properties(filename=prop_file)
+        if _host is None:
+            self.props = _load_run_properties(run_dir)
+        else:
+            self.props = _host.props
+
+        # Map each file to a dictionary of timings.
+        timings = defaultdict(dict)
 
         for filename, file_parser in list(self.file_parsers.items()):
             # If filename is absolute it will not be changed here.
             path = os.path.join(run_dir, filename)
+            start_time = time.perf_counter()
             try:
-                file_parser.load_file(path)
+                file_parser.load_file(path, streaming=self.streaming)
             except OSError as err:
                 if err.errno == errno.ENOENT:
                     logging.info(f'File "{path}" is missing and thus not parsed.')
                     del self.file_parsers[filename]
                 else:
                     logging.error(f'Failed to read "{path}": {err}')
-
-        for file_parser in self.file_parsers.values():
-            self.props.update(file_parser.search_patterns())
-
-        for file_parser in self.file_parsers.values():
-            file_parser.apply_functions(self.props)
-
-        self.props.write()
+            else:
+                if not file_parser.complete:
+                    self.props.add_unexplained_error(
+                        f'File "{path}" ends unexpectedly and was only parsed '
+                        f"partially."
+                    )
+                if self.profile:
+                    timings[filename]["read"] = time.perf_counter() - start_time
+
+        for filename, file_parser in self.file_parsers.items():
+            file_timings = timings[filename] if self.profile else None
+            self.props.update(file_parser.search_patterns(file_timings))
+
+        for filename, file_parser in self.file_parsers.items():
+            file_timings = timings[filename] if self.profile else None
+            file_parser.apply_functions(self.props, file_timings)
+            file_parser.close()
+
+        if _host is None:
+            self.props.write()
+
+        if self.profile:
+            _write_profile(run_dir, timings)
+
+
+def _write_profile(run_dir, timings):
+    profile = tools.Properties(
+        filename=os.path.join(run_dir, PROFILE_FILENAME), codec="compact-json"
+    )
+    # Distinguish the parsers of a run by their script names.
+    parser_name = os.path.basename(sys.argv[0])
+    for filename, file_timings in timings.items():
+        for name, seconds in file_timings.items():
+            profile[f"{parser_name}: {name} ({filename})"] = seconds
+    profile.write()
+
+
+def summarize_profiles(exp_dir, num_entries=20):
+    """
+    Sum up the parser timings of all runs in *exp_dir* (see
+    :class:`Parser`), write them to the ``parser-profile`` file in
+    *exp_dir* and log the *num_entries* most expensive entries. Return
+    the summary, which maps each timed step to its total, maximum and
+    number of runs.
+    """
+    summary = {}
+    run_dirs = sorted(glob(os.path.join(exp_dir, "runs-*-*", "*")))
+    for run_dir in run_dirs:
+        profile_file = os.path.join(run_dir, PROFILE_FILENAME)
+        if not os.path.exists(profile_file):
+            continue
+        for name, seconds in tools.Properties(filename=profile_file).items():
+            entry = summary.setdefault(name, {"total": 0.0, "max": 0.0, "runs": 0})
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            entry["runs"] += 1
+    profile_file = os.path.join(exp_dir, PROFILE_FILENAME)
+    if not summary:
+        if os.path.exists(profile_file):
+            tools.remove_path(profile_file)
+        return summary
+
+    profile = tools.Properties(filename=profile_file, codec="compact-json")
+    profile.update(summary)
+    profile.write()
+    entries = sorted(summary.items(), key=lambda item: -item[1]["total"])
+    lines = [
+        f"{entry['total']:10.3f}s {entry['total'] / entry['runs'] * 1000:10.3f}ms "
+        f"{entry['max'] * 1000:10.3f}ms  {name}"
+        for name, entry in entries[:num_entries]
+    ]
+    logging.info(
+        f"Parser profile of {len(run_dirs):d} runs (total, mean, maximum):\n"
+        + "\n".join(lines)
+    )
+    return summary
+
+
+def run_parsers(parser_files):
+    """
+    Execute the given parser scripts one after another in the current
+    process and the current run directory.
+
+    All parsers share one properties object and read each file only
+    once. The ``properties`` file is loaded before the first parser
+    starts and written after the last parser finishes. A parser that
+    raises an exception or exits with a non-zero status doesn't stop
+    the remaining parsers. Return True if all parsers succeeded.
+
+    This function is used by experiments with ``parser_host=True``,
+    which execute ``python -m lab.parser parser1.py parser2.py ...`` in
+    each run directory.
+    """
+    global _host
+    # Parsers reconfigure logging, so restore the old configuration later.
+    root_logger = logging.getLogger("")
+    old_handlers, old_level = list(root_logger.handlers), root_logger.level
+    tools.configure_logging()
+    _host = _ParserHost(os.path.abspath("."))
+    success = True
+    try:
+        for parser_file in parser_files:
+            old_argv = sys.argv
+            sys.argv = [parser_file]
+            try:
+                runpy.run_path(parser_file, run_name="__main__")
+            except SystemExit as err:
+                if err.code:
+                    logging.error(f"Parser {parser_file} exited with {err.code!r}")
+                    success = False
+            except Exception:
+                logging.exception(f"Parser {parser_file} failed")
+                success = False
+            finally:
+                sys.argv = old_argv
+        _host.props.write()
+    finally:
+        _host = None
+        root_logger.handlers = old_handlers
+        root_logger.setLevel(old_level)
+    return success
+
+
+if __name__ == "__main__":
+    # Use the functions and state of the imported module, since the
+    # parsers import lab.parser, not __main__.
+    from lab.parser import run_parsers as run_parsers_in_host
+
+    sys.exit(0 if run_parsers_in_host(sys.argv[1:]) else 1)
@@ -13,7 +13,7 @@ import sys
 
 import txt2tags
 
-from lab import tools
+from lab import columnar, tools
 from lab.reports import markup
 from lab.reports.markup import Document, ESCAPE_WORDBREAK
 
@@ -414,12 +414,24 @@ class Report:
         self._all_attributes = self._get_type_map(attributes)
 
     def _load_data(self):
-        props_file = os.path.join(self.eval_dir, "properties")
+        props_file = tools.find_properties_file(
+            os.path.join(self.eval_dir, "properties")
+        )
         if not os.path.exists(props_file):
             logging.critical(f"Properties file not found at {props_file}")
 
         logging.info("Reading properties file")
-        self.props = tools.Properties(filename=props_file)
+        # Indexed properties files let us skip runs that are filtered out.
+        selected_props = self.run_filter.load_selected(props_file, share_values=True)
+        if selected_props is not None:
+            self.props = selected_props
+            if not self.props:
+                logging.critical("All runs have been filtered -> Nothing to report.")
+        else:
+            # Prefer the faster columnar sidecar file if it is up to date.
+            self.props = columnar.read_columns(props_file) or tools.Properties(
+                filename=props_file, share_values=True
+            )
         logging.info("Reading properties file finished")
         if not self.props:
             logging.critical("properties file in evaluation dir is empty.")
@@ -1,15 +1,23 @@
 import argparse
 import colorsys
 import functools
+import gzip
+import io
 import logging
+import lzma
+import marshal
 import math
+import mmap
+import multiprocessing
 import os
 from pathlib import Path
 import pkgutil
 import re
 import shutil
+import struct
 import subprocess
 import sys
+import zlib
 
 
 # Use simplejson where it's available, because it is compatible (just separately
@@ -222,6 +230,36 @@ def run_command(cmd, **kwargs):
     return subprocess.call(cmd, **kwargs)
 
 
+def get_jobs(jobs):
+    """
+    Return the number of worker processes for the *jobs* option. If
+    *jobs* is None, use as many processes as there are CPUs.
+    """
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs < 1:
+        logging.critical(f"jobs must be at least 1: {jobs}")
+    return jobs
+
+
+def map_jobs(function, items, jobs, ordered=True):
+    """
+    Yield the results of *function* for the list *items*. If *jobs* is
+    greater than 1, the items are processed by a pool of worker
+    processes. If *ordered* is False, the results are yielded in the
+    order in which they become available.
+    """
+    if jobs == 1:
+        yield from map(function, items)
+        return
+    # Use large chunks to keep the communication overhead low, but
+    # small enough chunks to distribute the work evenly.
+    chunksize = max(1, min(100, len(items) // (4 * jobs)))
+    with multiprocessing.Pool(processes=jobs) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(function, items, chunksize=chunksize)
+
+
 def add_unexplained_error(dictionary, error):
     """
     Add *error* to the list of unexplained errors at
@@ -249,6 +287,448 @@ def compute_log_score(success, value, lower_bound, upper_bound):
     return raw_score / best_raw_score
 
 
+class SharedValues:
+    """
+    Store equal strings only once.
+
+    Large properties files contain the same keys and values (e.g.,
+    revision hashes or options) for many runs. Sharing them makes memory
+    usage scale with the number of distinct strings instead of the
+    number of runs. Only immutable strings are shared, so the loaded
+    lists and dictionaries can be modified safely.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def share(self, value):
+        """
+        Return the shared copy of *value*, recursing into lists and
+        dictionaries.
+        """
+        value_type = type(value)
+        if value_type is str:
+            return self._values.setdefault(value, value)
+        elif value_type is list:
+            return [self.share(item) for item in value]
+        elif value_type is dict:
+            return self.object_pairs_hook(value.items())
+        return value
+
+    def object_pairs_hook(self, pairs):
+        """Build a dictionary with shared keys and values while decoding JSON."""
+        return {self.share(key): self.share(value) for key, value in pairs}
+
+
+class JsonCodec:
+    """Pretty-printed JSON (default). This format is easy to read for humans."""
+
+    name = "json"
+
+    @staticmethod
+    def detect(data):
+        return data.startswith(b"{\n  ") or data.startswith(b"{}")
+
+    @staticmethod
+    def dumps(props):
+        return get_bytes(str(props))
+
+    @staticmethod
+    def loads(data, shared_values=None):
+        hook = shared_values.object_pairs_hook if shared_values else None
+        return json.loads(get_string(data), object_pairs_hook=hook)
+
+
+class CompactJsonCodec:
+    """
+    JSON without indentation and with one item per line. Files are
+    smaller and faster to write than pretty-printed JSON files, but can
+    still be read by any JSON parser.
+    """
+
+    name = "compact-json"
+
+    @staticmethod
+    def detect(data):
+        return data.startswith(b'{\n"')
+
+    @staticmethod
+    def dumps(props):
+        encoder = Properties._PropertiesEncoder(separators=(",", ":"))
+        items = ",\n".join(
+            f"{encoder.encode(str(key))}:{encoder.encode(props[key])}"
+            for key in sorted(props)
+        )
+        return get_bytes(f"{{\n{items}\n}}\n" if items else "{}\n")
+
+    loads = JsonCodec.loads
+
+
+class BinaryCodec:
+    """
+    Binary format based on the :py:mod:`marshal` module. Files are much
+    faster to write and faster to read than JSON files, but they are not
+    human-readable.
+
+    The marshal format may change between Python versions, so the header
+    stores the marshal and Python versions that wrote the file and only
+    the same versions can read it. Use a JSON codec for properties that
+    need to be read by other Python versions.
+    """
+
+    name = "binary"
+    magic_prefix = b"LAB-PROPERTIES marshal"
+    magic = get_bytes(
+        f"LAB-PROPERTIES marshal {marshal.version} "
+        f"python{sys.version_info.major}.{sys.version_info.minor}\n"
+    )
+
+    @classmethod
+    def detect(cls, data):
+        return data.startswith(cls.magic_prefix)
+
+    @classmethod
+    def dumps(cls, props):
+        return cls.magic + marshal.dumps(cls._make_json_compatible(props))
+
+    @classmethod
+    def loads(cls, data, shared_values=None):
+        header = data[: data.find(b"\n") + 1]
+        if header != cls.magic:
+            raise ValueError(
+                f"binary properties written with {get_string(header).strip()!r} "
+                f"can't be read with {get_string(cls.magic).strip()!r}. Please "
+                f"rewrite them with a JSON codec using the Python version that "
+                f"wrote them."
+            )
+        props = marshal.loads(data[len(cls.magic) :])
+        return shared_values.share(props) if shared_values else props
+
+    @classmethod
+    def _make_json_compatible(cls, value):
+        """Convert values like JSON does to get the same data after loading."""
+        if isinstance(value, dict):
+            return {
+                key
+                if isinstance(key, str)
+                else json.dumps(key): (cls._make_json_compatible(item))
+                for key, item in value.items()
+            }
+        elif isinstance(value, (list, tuple)):
+            return [cls._make_json_compatible(item) for item in value]
+        elif isinstance(value, Path):
+            return str(value)
+        return value
+
+
+class IndexedCodec:
+    """
+    Compact JSON for each item, preceded by an index that maps the keys
+    to the byte ranges of their values. For evaluation directories, the
+    index also holds the values of some attributes of each run (see
+    *attributes*), so runs can be selected without decoding them (see
+    :py:class:`PropertiesIndex`).
+    """
+
+    name = "indexed"
+    magic = b"LAB-PROPERTIES indexed\n"
+    #: Store the values of these run attributes in the index.
+    attributes = ["algorithm", "domain"]
+
+    @classmethod
+    def detect(cls, data):
+        return data.startswith(cls.magic)
+
+    @classmethod
+    def dumps(cls, props):
+        encoder = Properties._PropertiesEncoder(separators=(",", ":"))
+        index = []
+        blocks = []
+        # Store the values as a JSON list to be able to decode all of
+        # them with a single call.
+        offset = 1
+        for key in sorted(props):
+            value = props[key]
+            block = get_bytes(encoder.encode(value))
+            index_values = {}
+            if isinstance(value, dict):
+                index_values = {
+                    attr: value[attr] for attr in cls.attributes if attr in value
+                }
+            index.append([str(key), offset, len(block), index_values])
+            blocks.append(block)
+            offset += len(block) + 1
+        header = get_bytes(encoder.encode(index))
+        return b"".join(
+            [cls.magic, struct.pack("<Q", len(header)), header]
+            + [b"[", b",".join(blocks), b"]"]
+        )
+
+    @classmethod
+    def read_index(cls, data):
+        """Return the index entries and the start of the data blocks."""
+        header_start = len(cls.magic) + 8
+        (header_length,) = struct.unpack("<Q", data[len(cls.magic) : header_start])
+        data_start = header_start + header_length
+        index = json.loads(get_string(bytes(data[header_start:data_start])))
+        return index, data_start
+
+    @staticmethod
+    def decode_value(data, start, length, shared_values=None):
+        return JsonCodec.loads(bytes(data[start : start + length]), shared_values)
+
+    @classmethod
+    def loads(cls, data, shared_values=None):
+        index, data_start = cls.read_index(data)
+        values = JsonCodec.loads(data[data_start:], shared_values)
+        return {key: value for (key, _, _, _), value in zip(index, values)}
+
+
+#: Codecs for reading and writing properties files. The codec of an
+#: existing file is detected automatically.
+PROPERTIES_CODECS = {
+    codec.name: codec
+    for codec in [JsonCodec, CompactJsonCodec, BinaryCodec, IndexedCodec]
+}
+
+
+def _detect_properties_codec(data):
+    for codec in PROPERTIES_CODECS.values():
+        if codec.detect(data):
+            return codec
+    # Let the JSON parser report errors.
+    return JsonCodec
+
+
+def _compress_zstd(data):
+    return _import_zstandard().ZstdCompressor().compress(data)
+
+
+def _decompress_zstd(data):
+    # Use a stream reader, since frames written by other tools may lack
+    # the content size and compressed logs consist of several frames.
+    reader = (
+        _import_zstandard()
+        .ZstdDecompressor()
+        .stream_reader(io.BytesIO(data), read_across_frames=True)
+    )
+    return reader.readall()
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        logging.critical("Please install the zstandard package to use .zst files.")
+    return zstandard
+
+
+#: Compression formats for properties files, given as (compress,
+#: decompress) functions. Properties files whose name ends with
+#: ".<format>" are compressed with the corresponding format. The "zst"
+#: format needs the ``zstandard`` package.
+PROPERTIES_COMPRESSIONS = {
+    "gz": (functools.partial(gzip.compress, compresslevel=6), gzip.decompress),
+    "xz": (lzma.compress, lzma.decompress),
+    "zst": (_compress_zstd, _decompress_zstd),
+}
+
+
+def _open_zstd(filename, mode):
+    zstandard = _import_zstandard()
+    if "r" not in mode:
+        return zstandard.open(filename, mode)
+    # Commands with compressed output append one frame per command.
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        open(filename, "rb"), read_across_frames=True, closefd=True
+    )
+    if "b" in mode:
+        return reader
+    return io.TextIOWrapper(io.BufferedReader(reader), encoding=DEFAULT_ENCODING)
+
+
+_COMPRESSED_FILE_OPENERS = {"gz": gzip.open, "xz": lzma.open, "zst": _open_zstd}
+
+#: File in a run dir that lists the logs that commands wrote compressed.
+COMPRESSED_LOGS_FILENAME = "compressed-logs"
+
+
+def get_compressor(compression, level=None):
+    """
+    Return an object with ``compress(data)`` and ``flush()`` methods
+    that compresses bytes incrementally into the given format ("gz",
+    "xz" or "zst"). If *level* is None, use the default level of the
+    format.
+    """
+    if compression == "gz":
+        # Add 16 to the window bits to write a gzip header and trailer.
+        return zlib.compressobj(
+            -1 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+    elif compression == "xz":
+        return lzma.LZMACompressor(preset=level)
+    elif compression == "zst":
+        kwargs = {} if level is None else {"level": level}
+        return _import_zstandard().ZstdCompressor(**kwargs).compressobj()
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def _get_compressed_variants(filename):
+    return [f"{filename}.{compression}" for compression in _COMPRESSED_FILE_OPENERS]
+
+
+def find_compressed_file(filename):
+    """
+    Return *filename* if it exists. Otherwise, return the first existing
+    compressed variant of *filename* (e.g., ``run.log.gz`` for
+    ``run.log``) or *filename* if no variant exists.
+    """
+    if os.path.exists(filename):
+        return filename
+    for path in _get_compressed_variants(filename):
+        if os.path.exists(path):
+            return path
+    return filename
+
+
+def find_log_files(filename):
+    """
+    Return the list of files that together hold the content of the log
+    *filename*.
+
+    Commands with compressed output (see the *compression* argument of
+    ``add_command()``) write to a compressed variant of the log, e.g.,
+    ``run.log.gz``, and list it in the :py:data:`COMPRESSED_LOGS_FILENAME`
+    file of the run dir. For such logs, return the compressed variant
+    followed by *filename*, which holds the output of the commands
+    without compression, if it exists. Otherwise, return
+    ``[find_compressed_file(filename)]``, so an uncompressed log takes
+    precedence over a copy that was compressed after the run.
+    """
+    run_dir = os.path.dirname(os.path.abspath(filename))
+    try:
+        with open(os.path.join(run_dir, COMPRESSED_LOGS_FILENAME)) as f:
+            compressed_logs = set(f.read().splitlines())
+    except FileNotFoundError:
+        compressed_logs = set()
+    filenames = [
+        path
+        for path in _get_compressed_variants(filename)
+        if os.path.relpath(path, run_dir) in compressed_logs and os.path.exists(path)
+    ]
+    if not filenames:
+        return [find_compressed_file(filename)]
+    if os.path.exists(filename):
+        filenames.append(filename)
+    return filenames
+
+
+def is_compressed(filename):
+    """Return True if *filename* ends with ".gz", ".xz" or ".zst"."""
+    return _split_compression(filename)[1] is not None
+
+
+def open_file(filename, mode="r"):
+    """
+    Open *filename* and decompress it transparently if its name ends
+    with ".gz", ".xz" or ".zst". Files are opened in text mode unless
+    *mode* contains "b".
+    """
+    _, compression = _split_compression(filename)
+    if compression is None:
+        return open(filename, mode)
+    if "b" not in mode and "t" not in mode:
+        mode += "t"
+    return _COMPRESSED_FILE_OPENERS[compression](filename, mode)
+
+
+def get_decompression_errors(filename):
+    """
+    Return the exceptions that reading the compressed file *filename*
+    raises if the file is incomplete or corrupted.
+    """
+    errors = (EOFError, OSError, lzma.LZMAError, zlib.error)
+    if filename.endswith(".zst"):
+        errors += (_import_zstandard().ZstdError,)
+    return errors
+
+
+def _read_chunks(f, filename):
+    chunks = []
+    try:
+        # Read the file in small steps to keep as much as possible.
+        for chunk in iter(functools.partial(f.read1, 2**16), b""):
+            chunks.append(chunk)
+    except get_decompression_errors(filename):
+        return b"".join(chunks), False
+    return b"".join(chunks), True
+
+
+def read_compressed_file(filename):
+    """
+    Return the decompressed content of *filename* as bytes and whether
+    the file is complete. If the file ends unexpectedly, e.g., because
+    the command writing it was killed, or is corrupted, return the
+    content that can be decompressed.
+    """
+    with open_file(filename, "rb") as f:
+        return _read_chunks(f, filename)
+
+
+def decompress_data(data, filename):
+    """
+    Like :func:`read_compressed_file`, but decompress the bytes *data*
+    that were read from the compressed file *filename*.
+    """
+    _, compression = _split_compression(filename)
+    if compression == "zst":
+        reader = (
+            _import_zstandard()
+            .ZstdDecompressor()
+            .stream_reader(io.BytesIO(data), read_across_frames=True)
+        )
+    else:
+        reader = _COMPRESSED_FILE_OPENERS[compression](io.BytesIO(data), "rb")
+    with reader:
+        return _read_chunks(reader, filename)
+
+
+def _split_compression(filename):
+    """Split *filename* into the uncompressed name and the compression."""
+    for compression in PROPERTIES_COMPRESSIONS:
+        if filename.endswith(f".{compression}"):
+            return filename[: -len(compression) - 1], compression
+    return filename, None
+
+
+def _get_properties_file_variants(filename):
+    base, _ = _split_compression(filename)
+    return [base] + [f"{base}.{compression}" for compression in PROPERTIES_COMPRESSIONS]
+
+
+def find_properties_file(filename):
+    """
+    Return *filename* if it exists. Otherwise, return the first existing
+    uncompressed or compressed variant of *filename*, e.g.,
+    ``properties.xz`` for ``properties``. Return *filename* if no
+    variant exists.
+    """
+    if os.path.exists(filename):
+        return filename
+    for path in _get_properties_file_variants(filename):
+        if os.path.exists(path):
+            return path
+    return filename
+
+
+def get_properties_codec(filename):
+    """Return the name of the codec of the properties file *filename*."""
+    if not os.path.exists(filename):
+        return None
+    with open(filename, "rb") as f:
+        return _detect_properties_codec(f.read(len(BinaryCodec.magic))).name
+
+
 class Properties(dict):
     class _PropertiesEncoder(json.JSONEncoder):
         def default(self, o):
@@ -257,8 +737,33 @@ class Properties(dict):
             else:
                 return super().default(o)
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, codec=None, compression=None, share_values=False):
+        """
+        *codec* is the name of the codec for writing the properties to
+        disk (see :py:data:`PROPERTIES_CODECS`). If it is None, use the
+        codec of the loaded file or "json" if there is no such file.
+
+        *compression* is the name of the compression format for writing
+        the properties (see :py:data:`PROPERTIES_COMPRESSIONS`). If it
+        is None, use the format given by the extension of *filename*,
+        the format of the loaded file or no compression. If *filename*
+        doesn't exist, load its uncompressed or compressed variant
+        instead (see :py:func:`find_properties_file`).
+
+        If *share_values* is True, equal strings are stored only once
+        (see :py:class:`SharedValues`). This saves a lot of memory for
+        large properties files.
+        """
+        if codec is not None and codec not in PROPERTIES_CODECS:
+            logging.critical(f"Unknown properties codec: {codec}")
+        if compression is not None and compression not in PROPERTIES_COMPRESSIONS:
+            logging.critical(f"Unknown properties compression: {compression}")
         self.filename = filename
+        self.codec = codec
+        self.compression = compression
+        self.share_values = share_values
+        if filename and not compression:
+            self.compression = _split_compression(filename)[1]
         self.load(filename)
         dict.__init__(self)
 
@@ -272,35 +777,137 @@ class Properties(dict):
         )
 
     def load(self, filename):
-        if not filename or not os.path.exists(filename):
+        if not filename:
             return
-        with open(filename) as f:
+        filename = find_properties_file(filename)
+        if not os.path.exists(filename):
+            return
+        with open(filename, "rb") as f:
+            data = f.read()
+        compression = _split_compression(filename)[1]
+        if compression:
+            if self.compression is None:
+                self.compression = compression
+            _, decompress = PROPERTIES_COMPRESSIONS[compression]
             try:
-                self.update(json.load(f))
-            except ValueError as e:
-                logging.critical(f"JSON parse error in file '{filename}': {e}")
+                data = decompress(data)
+            except (EOFError, OSError, lzma.LZMAError) as e:
+                logging.critical(f"Failed to decompress '{filename}': {e}")
+        self.loads(data, filename)
+
+    def loads(self, data, filename=None):
+        """Add the properties from the bytes *data*.
+
+        *filename* is only used for error messages.
+        """
+        codec = _detect_properties_codec(data)
+        if self.codec is None:
+            self.codec = codec.name
+        shared_values = SharedValues() if self.share_values else None
+        try:
+            self.update(codec.loads(data, shared_values))
+        except (EOFError, ValueError) as e:
+            logging.critical(f"Parse error in properties file '{filename}': {e}")
 
     def add_unexplained_error(self, error):
         add_unexplained_error(self, error)
 
     def write(self):
-        """Write the properties to disk."""
+        """Write the properties to disk.
+
+        If the properties are compressed, the file gets the extension of
+        the compression format and ``self.filename`` is updated
+        accordingly. Other variants of the file are removed, since they
+        would be outdated.
+        """
         assert self.filename
         makedirs(os.path.dirname(self.filename))
-        write_file(self.filename, str(self))
+        codec = PROPERTIES_CODECS[self.codec or JsonCodec.name]
+        data = codec.dumps(self)
+        filename, _ = _split_compression(self.filename)
+        if self.compression:
+            compress, _ = PROPERTIES_COMPRESSIONS[self.compression]
+            data = compress(data)
+            filename = f"{filename}.{self.compression}"
+        # Write to a temporary file and rename it afterwards to make sure
+        # that readers never see a partially written file.
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "wb") as f:
+            f.write(data)
+        os.replace(tmp_filename, filename)
+        for path in _get_properties_file_variants(filename):
+            if path != filename and os.path.exists(path):
+                os.remove(path)
+        self.filename = filename
+
+
+class PropertiesIndex:
+    """
+    Memory-map a properties file written with the "indexed" codec and
+    decode runs only on demand.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if not IndexedCodec.detect(self._data[: len(IndexedCodec.magic)]):
+            logging.critical(f"{filename} is not an indexed properties file.")
+        index, self._data_start = IndexedCodec.read_index(self._data)
+        self._index = {
+            run_id: (offset, length, values) for run_id, offset, length, values in index
+        }
+
+    def __contains__(self, run_id):
+        return run_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_run_ids(self):
+        return list(self._index)
+
+    def get_run(self, run_id, shared_values=None):
+        """Decode and return the run with ID *run_id*."""
+        offset, length, _ = self._index[run_id]
+        return IndexedCodec.decode_value(
+            self._data, self._data_start + offset, length, shared_values
+        )
+
+    def load(self, select=None, share_values=False):
+        """
+        Return the runs as a :py:class:`Properties` instance. If
+        *select* is given, only decode the runs for which *select*
+        returns True when called with the indexed attributes of the run
+        (see :py:attr:`IndexedCodec.attributes`).
+        """
+        props = Properties(codec=IndexedCodec.name, share_values=share_values)
+        props.filename = self.filename
+        shared_values = SharedValues() if share_values else None
+        for run_id, (_, _, values) in self._index.items():
+            if select is None or select(values):
+                props[run_id] = self.get_run(run_id, shared_values)
+        return props
+
+    def close(self):
+        self._data.close()
 
 
 class RunFilter:
     def __init__(self, filter, **kwargs):
         self.filters = make_list(filter)
+        self.has_function_filters = bool(self.filters)
         self.filtered_attributes = []  # Only needed for sanity checks.
+        self.property_filters = []
         for arg_name, arg_value in kwargs.items():
             if not arg_name.startswith("filter_"):
                 logging.critical(f'Invalid filter keyword argument name "{arg_name}"')
             attribute = arg_name[len("filter_") :]
             # Add a filter for the specified property.
-            self.filters.append(self._build_filter(attribute, arg_value))
+            property_filter = self._build_filter(attribute, arg_value)
+            self.filters.append(property_filter)
             self.filtered_attributes.append(attribute)
+            self.property_filters.append((attribute, property_filter))
 
     def _build_filter(self, prop, value):
         # Do not define this function inplace to force early binding.
@@ -316,6 +923,42 @@ class RunFilter:
 
         return property_filter
 
+    def get_index_selector(self, attributes):
+        """
+        Return a function that applies the property filters for
+        *attributes* to a dictionary with the values of these
+        attributes. Runs rejected by this function are also rejected by
+        :py:meth:`apply`. Return None if there are no such filters or
+        if there are filter functions, since they are applied first
+        and may change the runs.
+        """
+        if self.has_function_filters:
+            return None
+        filters = [
+            property_filter
+            for attribute, property_filter in self.property_filters
+            if attribute in attributes
+        ]
+        if not filters:
+            return None
+        return lambda values: all(filter_(values) for filter_ in filters)
+
+    def load_selected(self, filename, share_values=False):
+        """
+        If *filename* is an uncompressed properties file written with the
+        "indexed" codec, return the runs that may pass the property
+        filters without decoding the other runs. Otherwise, return None.
+        The filters still need to be applied to the returned runs.
+        """
+        select = self.get_index_selector(IndexedCodec.attributes)
+        if select is None or get_properties_codec(filename) != IndexedCodec.name:
+            return None
+        index = PropertiesIndex(filename)
+        props = index.load(select, share_values=share_values)
+        logging.info(f"Decoded {len(props)} of {len(index)} runs in {filename}")
+        index.close()
+        return props
+
     @staticmethod
     def apply_filter_to_run(filter_, run):
         # No need to copy the run as the original run is only needed if
@@ -0,0 +1,210 @@
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+import pytest
+
+from lab import tools
+from lab.calls import call
+from lab.calls.call import Call
+
+
+def test_call_records_resource_usage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code = "x = bytearray(50 * 1024 * 1024); sum(range(10 ** 6))"
+    assert Call([sys.executable, "-c", code], name="cmd").wait() == 0
+    assert (
+        Call([sys.executable, "-c", "import sys; sys.exit(3)"], name="fail").wait() == 3
+    )
+    props = tools.Properties(str(tmp_path / "call-properties"))
+    assert props["cmd_peak_rss"] > 50 * 1024
+    assert props["cmd_cpu_time"] > 0
+    assert props["cmd_cpu_time"] == props["cmd_user_time"] + props["cmd_system_time"]
+    assert "fail_voluntary_context_switches" in props
+
+
+def test_call_properties_use_codec_of_static_properties(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tools.Properties(str(tmp_path / "static-properties"), codec="binary").write()
+    assert Call([sys.executable, "-c", "pass"], name="cmd").wait() == 0
+    assert tools.get_properties_codec(str(tmp_path / "call-properties")) == "binary"
+    assert "cmd_wall_clock_time" in tools.Properties(str(tmp_path / "call-properties"))
+
+
+def test_call_enforces_wall_clock_time_limit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(call, "KILL_GRACE_PERIOD", 0.5)
+    # The child ignores SIGTERM and its own child keeps stdout open.
+    code = (
+        "import signal, subprocess, sys, time; "
+        "signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); "
+        "time.sleep(60)"
+    )
+    start_time = time.time()
+    process = Call(
+        [sys.executable, "-c", code],
+        name="sleeper",
+        wall_clock_time_limit=0.5,
+        stdout=str(tmp_path / "run.log"),
+    )
+    assert process.wait() == -signal.SIGKILL
+    assert time.time() - start_time < 10
+    props = tools.Properties(str(tmp_path / "call-properties"))
+    assert props["sleeper_kill_reason"] == "wall_clock_time_limit"
+
+
+def test_call_samples_timeline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(call, "TIMELINE_SAMPLES", 5)
+    # The child allocates 100 MiB in its own child process.
+    code = (
+        "import subprocess, sys, time; time.sleep(0.2); subprocess.run("
+        "[sys.executable, '-c', 'import time; x = bytearray(100 * 2 ** 20); "
+        "time.sleep(0.5)'])"
+    )
+    Call([sys.executable, "-c", code], name="grow", sample_interval=0.02).wait()
+    with open(tmp_path / "grow-timeline.json") as f:
+        timeline = json.load(f)
+    samples = timeline["samples"]
+    assert timeline["columns"] == ["wall_clock_time", "rss", "cpu_time"]
+    assert 5 <= len(samples) < 10
+    assert max(rss for _, rss, _ in samples) > 100 * 1024
+    assert samples[0][1] < 100 * 1024
+    assert [time for time, _, _ in samples] == sorted(time for time, _, _ in samples)
+
+
+@pytest.mark.parametrize("splice", [True, False])
+def test_call_redirects_bytes_and_enforces_hard_limit(tmp_path, monkeypatch, splice):
+    monkeypatch.chdir(tmp_path)
+    if not splice:
+        monkeypatch.delattr(os, "splice", raising=False)
+    # Write multi-byte characters in chunks that split them.
+    code = (
+        "import os, sys, time; data = ('äöü' * 1000).encode(); "
+        "[os.write(1, data[i : i + 999]) for i in range(0, len(data), 999)]; "
+        "time.sleep(float(sys.argv[1]))"
+    )
+    for name, size in [("below", 6), ("above", 5)]:
+        Call(
+            [sys.executable, "-c", code, "0" if size == 6 else "60"],
+            name=name,
+            stdout=str(tmp_path / f"{name}.log"),
+            hard_stdout_limit=size,
+        ).wait()
+    assert (tmp_path / "below.log").read_text() == "äöü" * 1000
+    assert (tmp_path / "above.log").read_bytes() == ("äöü" * 1000).encode()[:5120]
+    props = tools.Properties(str(tmp_path / "call-properties"))
+    assert "below_kill_reason" not in props
+    assert props["above_kill_reason"] == "hard_stdout_limit"
+
+
+@pytest.mark.parametrize("compression", ["gz", "xz"])
+def test_call_compresses_output(tmp_path, monkeypatch, compression):
+    monkeypatch.chdir(tmp_path)
+    code = "import sys; print('err', file=sys.stderr); print('line ' * 2000)"
+    with open("run.log", "w") as run_log:
+        for name in ["first", "second"]:
+            Call(
+                [sys.executable, "-c", code],
+                name=name,
+                stdout=run_log,
+                stderr="run.err",
+                hard_stdout_limit=5,
+                compression=compression,
+                compression_level=1,
+            ).wait()
+    assert os.path.getsize("run.log") == 0
+    assert not os.path.exists("run.err")
+    # The hard limit applies to the uncompressed output.
+    expected = ("line " * 2000 + "\n").encode()[:5120]
+    with tools.open_file(f"run.log.{compression}", "rb") as f:
+        assert f.read() == 2 * expected
+    assert os.path.getsize(f"run.log.{compression}") < 1024
+    with open(tools.COMPRESSED_LOGS_FILENAME) as f:
+        assert sorted(f.read().splitlines()) == [
+            f"run.err.{compression}",
+            f"run.log.{compression}",
+        ]
+    with tools.open_file(f"run.err.{compression}") as f:
+        assert f.read() == "err\n" * 2
+    props = tools.Properties(str(tmp_path / "call-properties"))
+    assert props["second_kill_reason"] == "hard_stdout_limit"
+
+
+def test_call_keeps_head_and_tail_of_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code = "for i in range(100000): print(f'line {i}')\nprint('Search time: 1.5s')"
+    retcode = Call(
+        [sys.executable, "-c", code],
+        name="chatty",
+        stdout="run.log",
+        hard_stdout_limit=1,
+        tail_stdout_limit=1,
+    ).wait()
+    assert retcode == 0
+    lines = (tmp_path / "run.log").read_text().splitlines()
+    assert lines[0] == "line 0"
+    assert lines[-1] == "Search time: 1.5s"
+    assert os.path.getsize("run.log") < 2048 + 100
+    props = tools.Properties(str(tmp_path / "call-properties"))
+    assert "chatty_kill_reason" not in props
+    omitted_bytes = props["chatty_omitted_stdout_bytes"]
+    assert f"[... {omitted_bytes} bytes of stdout omitted ...]" in lines
+    total_bytes = sum(len(f"line {i}\n") for i in range(100000)) + 18
+    tail = (tmp_path / "run.log").read_bytes().split(b" omitted ...]\n")[1]
+    assert omitted_bytes == total_bytes - 1024 - len(tail)
+
+
+@pytest.mark.parametrize("prlimit", [True, False])
+def test_call_sets_resource_limits(tmp_path, monkeypatch, prlimit):
+    monkeypatch.chdir(tmp_path)
+    if not prlimit:
+        monkeypatch.delattr(resource, "prlimit", raising=False)
+    code = (
+        "import resource, time; time.sleep(0.1); print([resource.getrlimit(kind) "
+        "for kind in [resource.RLIMIT_CPU, resource.RLIMIT_AS, resource.RLIMIT_CORE]])"
+    )
+    Call(
+        [sys.executable, "-c", code],
+        name="limits",
+        time_limit=10,
+        memory_limit=1024,
+        stdout="run.log",
+    ).wait()
+    _, hard_memory_limit = resource.getrlimit(resource.RLIMIT_AS)
+    assert (tmp_path / "run.log").read_text() == (
+        f"[(10, 15), ({2 ** 30}, {hard_memory_limit}), (0, 0)]\n"
+    )
+
+
+def test_call_syncs_output_only_if_requested(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    synced_fds = []
+    monkeypatch.setattr(os, "fsync", synced_fds.append)
+    for sync_output in [False, True]:
+        Call(
+            ["echo", "output"],
+            name="echo",
+            stdout="run.log",
+            stderr="run.err",
+            sync_output=sync_output,
+        ).wait()
+        assert len(synced_fds) == 2 * sync_output
+    call.sync_output_files(["run.log", "run.err", "missing.log"])
+    assert len(synced_fds) == 4
+
+
+def test_call_reports_peak_rss_below_parent_rss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The kernel reports the RSS of this process as the command's peak RSS.
+    memory = bytearray(200 * 2**20)  # noqa: F841
+    code = "import time; time.sleep(0.3)"
+    Call([sys.executable, "-c", code], name="floor").wait()
+    Call([sys.executable, "-c", code], name="sampled", sample_interval=0.02).wait()
+    props = tools.Properties(str(tmp_path / "call-properties"))
+    assert props["floor_peak_rss"] > 200 * 1024
+    assert 0 < props["sampled_peak_rss"] < 100 * 1024
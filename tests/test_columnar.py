@@ -0,0 +1,52 @@
+import os
+
+from lab import columnar, tools
+
+
+def _write_props(filename):
+    props = tools.Properties(filename)
+    props["a-1"] = {
+        "id": ["a", "1"],
+        "algorithm": "a",
+        "coverage": 1,
+        "cost": 3.0,
+        "solved": True,
+        "huge": 2**70,
+        "mixed": 1,
+        "initial_h_values": {"ff": 3},
+    }
+    props["b-1"] = {
+        "id": ["b", "1"],
+        "algorithm": "b",
+        "coverage": 0,
+        "solved": False,
+        "mixed": 2.5,
+        "error": None,
+    }
+    props.write()
+    return props
+
+
+def test_columns_roundtrip(tmp_path):
+    props_file = str(tmp_path / "properties")
+    _write_props(props_file)
+    json_props = tools.Properties(props_file)
+    columnar.write_columns(json_props)
+    column_props = columnar.read_columns(props_file)
+    assert column_props == json_props
+    for run_id, run in json_props.items():
+        assert list(column_props[run_id]) == list(run)
+    assert columnar.read_columns(props_file, attributes=["coverage"]) == {
+        "a-1": {"coverage": 1},
+        "b-1": {"coverage": 0},
+    }
+
+
+def test_outdated_columns_are_ignored(tmp_path):
+    props_file = str(tmp_path / "properties")
+    props = _write_props(props_file)
+    columnar.write_columns(props)
+    props["c-1"] = {"id": ["c", "1"]}
+    props.write()
+    assert os.path.exists(columnar.get_sidecar_filename(props_file))
+    assert columnar.read_columns(props_file) is None
@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+import tarfile
+
+from lab import columnar, tools
+from lab.experiment import get_run_dir
+from lab.fetcher import Fetcher
+
+
+def _make_exp_dir(path, num_runs):
+    for task_id in range(1, num_runs + 1):
+        run_dir = os.path.join(path, get_run_dir(task_id))
+        os.makedirs(run_dir)
+        algo = f"algo{task_id % 2}"
+        static_props = {"id": [algo, f"task{task_id}"], "algorithm": algo}
+        with open(os.path.join(run_dir, "static-properties"), "w") as f:
+            json.dump(static_props, f)
+        with open(os.path.join(run_dir, "properties"), "w") as f:
+            json.dump({"coverage": task_id % 3, "cost": float(task_id)}, f)
+        with open(os.path.join(run_dir, "driver.log"), "w") as f:
+            f.write("node: localhost\n")
+
+
+def test_parallel_fetch_matches_serial_fetch(tmp_path):
+    exp_dir = str(tmp_path / "exp")
+    _make_exp_dir(exp_dir, 250)
+    serial_eval_dir = str(tmp_path / "serial-eval")
+    parallel_eval_dir = str(tmp_path / "parallel-eval")
+    Fetcher()(exp_dir, serial_eval_dir, merge=True)
+    Fetcher()(exp_dir, parallel_eval_dir, merge=True, jobs=3)
+    serial_props = tools.Properties(os.path.join(serial_eval_dir, "properties"))
+    assert len(serial_props) == 250
+    with open(os.path.join(serial_eval_dir, "properties")) as f1:
+        with open(os.path.join(parallel_eval_dir, "properties")) as f2:
+            assert f1.read() == f2.read()
+
+
+def test_incremental_fetch_rescans_changed_runs(tmp_path):
+    exp_dir = str(tmp_path / "exp")
+    _make_exp_dir(exp_dir, 20)
+    eval_dir = str(tmp_path / "exp-eval")
+    Fetcher()(exp_dir, eval_dir, merge=True, incremental=True)
+    assert os.path.exists(os.path.join(eval_dir, "fetch-manifest"))
+
+    with open(os.path.join(exp_dir, get_run_dir(7), "properties"), "w") as f:
+        json.dump({"coverage": 1, "cost": 42.0, "new_attribute": 1}, f)
+    Fetcher()(exp_dir, eval_dir, merge=True, incremental=True)
+
+    props = tools.Properties(os.path.join(eval_dir, "properties"))
+    assert len(props) == 20
+    assert props["algo1-task7"]["cost"] == 42.0
+    assert props["algo1-task7"]["new_attribute"] == 1
+    assert props["algo0-task8"]["cost"] == 8.0
+
+
+def test_watch_fetches_finished_runs(tmp_path, monkeypatch):
+    exp_dir = str(tmp_path / "exp")
+    _make_exp_dir(exp_dir, 30)
+    eval_dir = str(tmp_path / "exp-eval")
+    written_sidecars = []
+    write_columns = columnar.write_columns
+    monkeypatch.setattr(
+        columnar,
+        "write_columns",
+        lambda props: written_sidecars.append(write_columns(props)),
+    )
+    Fetcher().watch(exp_dir, eval_dir, merge=True, interval=3600)
+    # All runs are fetched in the first scan and written only once.
+    assert len(written_sidecars) == 1
+    props = tools.Properties(os.path.join(eval_dir, "properties"))
+    assert len(props) == 30
+    assert columnar.read_columns(props.filename) == props
+    Fetcher()(exp_dir, str(tmp_path / "full-eval"), merge=True)
+    assert props == tools.Properties(str(tmp_path / "full-eval" / "properties"))
+
+
+def test_fetch_from_archive(tmp_path):
+    exp_dir = str(tmp_path / "exp")
+    _make_exp_dir(exp_dir, 20)
+    with tarfile.open(str(tmp_path / "exp.tar.xz"), "w:xz") as tar:
+        tar.add(exp_dir, arcname="exp")
+    Fetcher()(str(tmp_path / "exp.tar.xz"), merge=True)
+    Fetcher()(exp_dir, str(tmp_path / "dir-eval"), merge=True)
+    archive_props = tools.Properties(str(tmp_path / "exp-eval" / "properties"))
+    assert len(archive_props) == 20
+    assert archive_props == tools.Properties(str(tmp_path / "dir-eval" / "properties"))
+
+
+def test_fetch_compressed_properties(tmp_path):
+    exp_dir = str(tmp_path / "exp")
+    _make_exp_dir(exp_dir, 20)
+    eval_dir = str(tmp_path / "exp-eval")
+    Fetcher()(exp_dir, eval_dir, merge=True, compression="gz")
+    assert sorted(os.listdir(eval_dir)) == ["properties.gz", "properties.gz.columns"]
+    merged_eval_dir = str(tmp_path / "merged-eval")
+    Fetcher()(eval_dir, merged_eval_dir, merge=True)
+    props = tools.Properties(os.path.join(merged_eval_dir, "properties"))
+    assert props.compression == "gz"
+    assert len(props) == 20
+
+
+def test_fetch_truncated_error_log(tmp_path):
+    # The run was killed while it wrote its compressed error log.
+    exp_dir = str(tmp_path / "exp")
+    _make_exp_dir(exp_dir, 1)
+    run_dir = os.path.join(exp_dir, get_run_dir(1))
+    data = gzip.compress("".join(f"error {i}\n" for i in range(1000)).encode())
+    with open(os.path.join(run_dir, "run.err.gz"), "wb") as f:
+        f.write(data[:-10])
+    with tarfile.open(str(tmp_path / "exp.tar.gz"), "w:gz") as tar:
+        tar.add(exp_dir, arcname="exp")
+    [archive_props] = Fetcher()._fetch_archive(str(tmp_path / "exp.tar.gz"))
+    for props in [Fetcher().fetch_dir(run_dir), archive_props]:
+        log_error, truncation_error = props["unexplained_errors"]
+        assert log_error.startswith("run.err.gz: error 0\nerror 1\n")
+        assert truncation_error.startswith("run.err.gz ends unexpectedly.")
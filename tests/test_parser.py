@@ -0,0 +1,234 @@
+import gzip
+import itertools
+import json
+import lzma
+import os
+import re
+import subprocess
+import sys
+import textwrap
+
+from lab import parser as parser_module
+from lab import tools
+from lab.experiment import _parse_run_dir_incrementally
+from lab.parser import findall, Parser, summarize_profiles
+
+
+PARSER_1 = """
+from lab.parser import Parser
+
+parser = Parser()
+parser.add_pattern("expansions", r"Expanded (\\d+) state", required=True)
+parser.parse()
+"""
+
+PARSER_2 = """
+from lab.parser import Parser
+
+def add_solved(content, props):
+    props["solved"] = int("Solution found" in content)
+    props["has_expansions"] = "expansions" in props
+
+parser = Parser()
+parser.add_pattern("cost", r"Plan cost: (.+)", type=float)
+parser.add_function(add_solved)
+parser.parse()
+"""
+
+
+def _make_run_dir(path):
+    os.makedirs(path)
+    with open(os.path.join(path, "static-properties"), "w") as f:
+        json.dump({"id": ["algo", "task"]}, f)
+    with open(os.path.join(path, "run.log"), "w") as f:
+        f.write("Expanded 42 state(s).\nSolution found.\nPlan cost: 7\n")
+    parsers = []
+    for index, content in enumerate([PARSER_1, PARSER_2], start=1):
+        parser = os.path.join(path, f"parser{index}.py")
+        with open(parser, "w") as f:
+            f.write(textwrap.dedent(content))
+        parsers.append(parser)
+    return parsers
+
+
+def _parse(run_dir, commands):
+    env = dict(os.environ, PYTHONPATH=tools.get_lab_path())
+    for command in commands:
+        subprocess.check_call(command, cwd=run_dir, env=env, stdout=subprocess.DEVNULL)
+    return tools.Properties(os.path.join(run_dir, "properties"))
+
+
+def test_parser_host_matches_separate_parsers(tmp_path):
+    run_dir = str(tmp_path / "separate")
+    parsers = _make_run_dir(run_dir)
+    separate_props = _parse(run_dir, [[sys.executable, parser] for parser in parsers])
+    assert separate_props == {
+        "cost": 7.0,
+        "expansions": 42,
+        "has_expansions": True,
+        "solved": 1,
+    }
+
+    run_dir = str(tmp_path / "host")
+    parsers = _make_run_dir(run_dir)
+    host_props = _parse(run_dir, [[sys.executable, "-m", "lab.parser"] + parsers])
+    assert host_props == separate_props
+
+
+def test_findall_matches_re_findall():
+    content = "a 1\nb 2\r\nab 3\n\nc 4"
+    for regex in [r"^(\w+) (\d+)$", r"^\w", r"^(a)|b", r"^(a)?(b)?", r"^"]:
+        for flags in [0, re.M, re.M | re.I]:
+            assert findall(regex, content, flags) == re.findall(regex, content, flags)
+
+
+def test_streaming_and_compressed_parsing_match_default_parsing(tmp_path, monkeypatch):
+    def count_lines(lines, props):
+        props["lines"] = sum(1 for _ in lines)
+
+    def add_solved(content, props):
+        props["solved"] = "Solution found" in content
+
+    results = []
+    for streaming, compress in itertools.product(
+        [False, True], [None, gzip, lzma, "split"]
+    ):
+        run_dir = tmp_path / f"{streaming}-{compress}"
+        _make_run_dir(str(run_dir))
+        if compress == "split":
+            # Only the first command compressed its output.
+            log = run_dir / "run.log"
+            first_line, rest = log.read_bytes().split(b"\n", 1)
+            (run_dir / "run.log.gz").write_bytes(gzip.compress(first_line + b"\n"))
+            (run_dir / tools.COMPRESSED_LOGS_FILENAME).write_text("run.log.gz\n")
+            log.write_bytes(rest)
+        elif compress:
+            log = run_dir / "run.log"
+            suffix = {gzip: "gz", lzma: "xz"}[compress]
+            (run_dir / f"run.log.{suffix}").write_bytes(
+                compress.compress(log.read_bytes())
+            )
+            log.unlink()
+        monkeypatch.chdir(run_dir)
+        parser = Parser(streaming=streaming)
+        parser.add_pattern("expansions", r"^Expanded (\d+) state", flags="M")
+        parser.add_pattern("cost", r"Plan cost: (.+)", type=float)
+        parser.add_pattern("missing", r"Missing (\d+)", file="missing.log")
+        parser.add_function(count_lines, lines=True)
+        parser.add_function(add_solved)
+        parser.parse()
+        results.append(tools.Properties(str(run_dir / "properties")))
+    assert all(props == results[0] for props in results)
+    assert results[0] == {
+        "cost": 7.0,
+        "expansions": 42,
+        "lines": 3,
+        "solved": True,
+    }
+
+
+def test_uncompressed_log_takes_precedence(tmp_path, monkeypatch):
+    # The log has been compressed after the run, e.g., with "gzip -k".
+    log = "Plan cost: 7\n"
+    (tmp_path / "run.log").write_text(log)
+    (tmp_path / "run.log.gz").write_bytes(gzip.compress(log.encode()))
+    monkeypatch.chdir(tmp_path)
+    parser = Parser()
+    parser.add_function(
+        lambda content, props: props.update(costs=content.count("Plan cost"))
+    )
+    parser.parse()
+    assert tools.Properties(str(tmp_path / "properties"))["costs"] == 1
+
+
+def test_truncated_compressed_log(tmp_path, monkeypatch):
+    # The run was killed while a command wrote its compressed output.
+    log = "".join(f"Expanded {i} state(s).\n" for i in range(10000))
+    data = gzip.compress(log.encode())
+    (tmp_path / "run.log.gz").write_bytes(data[: len(data) // 2])
+    monkeypatch.chdir(tmp_path)
+    for streaming in [False, True]:
+        parser = Parser(streaming=streaming)
+        parser.add_pattern("expansions", r"Expanded (\d+) state")
+        parser.add_function(
+            lambda lines, props: props.update(lines=sum(1 for _ in lines)),
+            lines=True,
+        )
+        parser.parse()
+        props = tools.Properties(str(tmp_path / "properties"))
+        assert props["expansions"] == 0
+        assert 0 < props["lines"] < 10000
+        assert props["unexplained_errors"] == [
+            f'File "{tmp_path / "run.log"}" ends unexpectedly and was only parsed '
+            f"partially."
+        ]
+        os.remove(tmp_path / "properties")
+
+
+def test_streaming_decodes_file_once_for_all_functions(tmp_path, monkeypatch):
+    (tmp_path / "run.log").write_text("Solution found.\n")
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    read_file = parser_module._read_file
+    monkeypatch.setattr(
+        parser_module,
+        "_read_file",
+        lambda filenames: calls.append(filenames) or read_file(filenames),
+    )
+    parser = Parser(streaming=True)
+    parser.add_function(lambda content, props: props.update(a="Solution" in content))
+    parser.add_function(lambda content, props: props.update(b="found" in content))
+    parser.parse()
+    props = tools.Properties(str(tmp_path / "properties"))
+    assert props["a"] and props["b"]
+    assert len(calls) == 1
+
+
+def test_incremental_parse_again(tmp_path):
+    run_dir = str(tmp_path / "run")
+    parsers = []
+    for parser in _make_run_dir(run_dir):
+        parsers.append(str(tmp_path / os.path.basename(parser)))
+        os.replace(parser, parsers[-1])
+    hashes = ["hash1", "hash2"]
+
+    def parse(hashes):
+        error, parsed, _ = _parse_run_dir_incrementally(
+            run_dir, parsers, hashes, in_process=True
+        )
+        assert error is None
+        return parsed, tools.Properties(os.path.join(run_dir, "properties"))
+
+    parsed, props = parse(hashes)
+    assert parsed and props["expansions"] == 42 and props["solved"] == 1
+    assert parse(hashes)[0] is False
+
+    # Only the second parser runs again, so it sees the first one's results.
+    os.remove(parsers[0])
+    parsed, new_props = parse(["hash1", "changed"])
+    assert parsed and new_props == props
+
+    with open(os.path.join(run_dir, "run.log"), "a") as f:
+        f.write("Plan cost: 8\n")
+    with open(parsers[0], "w") as f:
+        f.write(textwrap.dedent(PARSER_1))
+    parsed, props = parse(["hash1", "changed"])
+    assert parsed and props["cost"] == 7.0 and props["expansions"] == 42
+
+
+def test_parser_profile(tmp_path, monkeypatch):
+    exp_dir = tmp_path / "exp"
+    for run_dir in ["runs-00001-00100/00001", "runs-00001-00100/00002"]:
+        _make_run_dir(str(exp_dir / run_dir))
+        monkeypatch.chdir(exp_dir / run_dir)
+        parser = Parser(profile=True)
+        parser.add_pattern("expansions", r"Expanded (\d+) state")
+        parser.add_function(lambda content, props: None, file="missing.log")
+        parser.parse()
+    summary = summarize_profiles(str(exp_dir))
+    assert sorted(name.split(": ")[1] for name in summary) == [
+        "pattern expansions (run.log)",
+        "read (run.log)",
+    ]
+    assert all(entry["runs"] == 2 for entry in summary.values())
+    assert os.path.exists(exp_dir / "parser-profile")
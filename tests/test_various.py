@@ -1,6 +1,8 @@
 import datetime
 import os
 
+import pytest
+
 from lab import tools
 
 
@@ -60,3 +62,98 @@ def test_colors():
     assert tools.get_colors(row, True) == expected_min_wins
     assert tools.get_colors(row, False) == expected_max_wins
     assert tools.rgb_fractions_to_html_color(1, 0, 0.5) == "rgb(255,0,127)"
+
+
+def test_properties_codecs():
+    data = {
+        "algo-task": {"id": ["algo", "task"], "cost": 1.5, "solved": True, 3: None},
+        "empty": {},
+    }
+    expected = {
+        "algo-task": {"id": ["algo", "task"], "cost": 1.5, "solved": True, "3": None},
+        "empty": {},
+    }
+    for codec in tools.PROPERTIES_CODECS:
+        filename = os.path.join(base, f"properties-{codec}")
+        props = tools.Properties(filename, codec=codec)
+        props.update(data)
+        props.write()
+        loaded_props = tools.Properties(filename)
+        assert loaded_props.codec == codec
+        assert loaded_props == expected
+        assert tools.get_properties_codec(filename) == codec
+
+
+def test_binary_properties_from_other_python_version():
+    data = tools.BinaryCodec.dumps({"algo-task": {"cost": 1}})
+    assert tools.BinaryCodec.loads(data) == {"algo-task": {"cost": 1}}
+    other_data = data.replace(
+        tools.BinaryCodec.magic, b"LAB-PROPERTIES marshal 1 python2.7\n"
+    )
+    assert tools._detect_properties_codec(other_data) is tools.BinaryCodec
+    with pytest.raises(ValueError, match="python2.7"):
+        tools.BinaryCodec.loads(other_data)
+
+
+def test_compressed_properties():
+    filename = os.path.join(base, "compressed", "properties")
+    props = tools.Properties(filename)
+    props["algo-task"] = {"coverage": 1}
+    props.write()
+    for compression in ["gz", "xz"]:
+        props = tools.Properties(filename, compression=compression)
+        props.write()
+        assert props.filename == f"{filename}.{compression}"
+        assert not os.path.exists(filename)
+        assert tools.find_properties_file(filename) == props.filename
+        loaded_props = tools.Properties(filename)
+        assert loaded_props.compression == compression
+        assert loaded_props == {"algo-task": {"coverage": 1}}
+
+
+def test_properties_share_values():
+    filename = os.path.join(base, "shared", "properties")
+    props = tools.Properties(filename)
+    for task in range(3):
+        props[f"algo-{task}"] = {
+            "rev": "abc",
+            "options": ["--search", "astar"],
+            "unexplained_errors": [],
+        }
+    props.write()
+    for codec in tools.PROPERTIES_CODECS:
+        props.codec = codec
+        props.write()
+        loaded_props = tools.Properties(filename, share_values=True)
+        assert loaded_props == props
+        runs = list(loaded_props.values())
+        assert runs[0]["rev"] is runs[2]["rev"]
+        assert runs[0]["options"][1] is runs[2]["options"][1]
+        # Lists are not shared, so modifying them only affects one run.
+        tools.add_unexplained_error(runs[0], "boom")
+        runs[0]["options"].append("--verbose")
+        assert runs[2]["unexplained_errors"] == []
+        assert runs[2]["options"] == ["--search", "astar"]
+
+
+def test_indexed_properties():
+    filename = os.path.join(base, "indexed", "properties")
+    props = tools.Properties(filename, codec="indexed")
+    for algo in ["a1", "a2", "a3"]:
+        for domain in ["d1", "d2"]:
+            run_id = f"{algo}-{domain}"
+            props[run_id] = {"algorithm": algo, "domain": domain, "id": [algo, domain]}
+    props.write()
+    index = tools.PropertiesIndex(filename)
+    assert len(index) == 6 and "a2-d1" in index
+    assert index.get_run_ids()[0] == "a1-d1"
+    assert index.get_run("a2-d1") == props["a2-d1"]
+    index.close()
+
+    run_filter = tools.RunFilter(
+        None, filter_algorithm=["a1", "a3"], filter_domain="d2"
+    )
+    selected_props = run_filter.load_selected(filename)
+    assert sorted(selected_props) == ["a1-d2", "a3-d2"]
+    assert tools.RunFilter(lambda run: True).load_selected(filename) is None
+    assert tools.RunFilter(None, filter_domain="d2").load_selected(src_file) is None